@@ -0,0 +1,151 @@
+"""Benchmarks of the map pipeline stages on synthetic networks.
+
+Every stage the apps run to put a day on the map is timed on its own, on
+networks from ``synthetic.py`` at several multiples of the current size:
+
+- ``csv_load``: reading the PlotData CSV (``read_plotdata_csv``)
+- ``wkt_parse``: LINESTRING text to a coordinate buffer (``parse_linestrings``)
+- ``projection``: UTM to lat/lon (``project_coords``)
+- ``color_mapping``: Seats to line colors (``capacity_colors``)
+- ``folium_build``: the folium map with the line and station layers, as
+  the apps' ``add_lines_to_map``/``add_stations_to_map`` build it
+- ``repr_html``: serializing that map (``_repr_html_``), whose size is
+  recorded as ``html_bytes``
+
+Each stage reports the best and the median of ``--repeat`` runs. ``--out``
+saves the results as JSON; ``--baseline`` compares a run against such a
+file, and ``--max-slowdown`` turns a regression into a non-zero exit. The
+inputs are generated locally and the map uses no tile layer, so the suite
+runs offline.
+
+    $ python benchmark.py --scales 1 10 100 --out bench.json
+    $ python benchmark.py --baseline bench.json --max-slowdown 1.25
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import folium
+import numpy as np
+import pandas as pd
+
+from colormap import capacity_colors
+from geometry import parse_linestrings
+from line_store import read_plotdata_csv
+from network import normalize_capacity
+from projection import project_coords
+from render import add_line_layer, add_station_layer
+from synthetic import write_dataset
+
+SCALES = (1, 10, 100)
+REPEAT = 5
+STAGES = ("csv_load", "wkt_parse", "projection", "color_mapping", "folium_build", "repr_html")
+CENTER = (52.1, 5.3)
+ZOOM = 8
+PRECISION = 5  # As COORDINATE_PRECISION in map_app.py
+
+
+# Best and median wall time in seconds of repeat calls, and the last result
+def timed(function, repeat=REPEAT):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times)}, result
+
+
+def build_map(lines, stations):
+    m = folium.Map(location=CENTER, zoom_start=ZOOM, control_scale=True, tiles=None)
+    add_line_layer(m, lines, precision=PRECISION, encoded=True)
+    colors = np.where(stations['Randstad'] == 0.0, '#bbbfb5', '#868a81')
+    add_station_layer(m, stations, colors, precision=PRECISION)
+    return m
+
+
+# Stage timings for one synthetic network scale, written to data_dir
+def run_scale(scale, data_dir, repeat=REPEAT):
+    paths, stations_path = write_dataset(data_dir, scale, days=("Monday",))
+    stages = {}
+    stages["csv_load"], df = timed(lambda: read_plotdata_csv(paths["Monday"]), repeat)
+    stages["wkt_parse"], (coords, offsets, valid) = timed(lambda: parse_linestrings(df["geometry"]), repeat)
+    stages["projection"], latlon = timed(lambda: project_coords(coords), repeat)
+    stages["color_mapping"], colors = timed(lambda: capacity_colors(normalize_capacity(df["Seats"])), repeat)
+
+    lines = df[valid].assign(latlon_coords=np.split(latlon, offsets[1:-1]),
+                             color_hex=np.asarray(colors)[valid])
+    stations = pd.read_csv(stations_path)
+    stages["folium_build"], m = timed(lambda: build_map(lines, stations), repeat)
+    stages["repr_html"], html = timed(m._repr_html_, repeat)
+    return {"segments": len(df), "points": len(coords), "stations": len(stations),
+            "html_bytes": len(html.encode()), "stages": stages}
+
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "folium": folium.__version__, "machine": platform.machine()}
+
+
+# Print one row per stage, with the change against the baseline when given
+def report(results, baseline=None):
+    rows = []
+    print(f"{'scale':>6} {'stage':<14} {'best ms':>10} {'median ms':>10} {'vs baseline':>12}")
+    for scale, result in results["scales"].items():
+        base = (baseline or {}).get("scales", {}).get(scale)
+        for stage in STAGES:
+            timing = result["stages"][stage]
+            ratio = timing["min"] / base["stages"][stage]["min"] if base else None
+            rows.append((scale, stage, ratio))
+            change = f"{ratio:.2f}x" if ratio is not None else ""
+            print(f"{scale:>6} {stage:<14} {timing['min'] * 1e3:>10.1f} {timing['median'] * 1e3:>10.1f} {change:>12}")
+        size = f"{result['html_bytes'] / 1e6:.2f} MB"
+        if base:
+            size += f" ({result['html_bytes'] / base['html_bytes']:.2f}x)"
+        print(f"{scale:>6} {'html_bytes':<14} {size:>10}   "
+              f"({result['segments']} segments, {result['points']} points, {result['stations']} stations)")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the map pipeline stages on synthetic networks.")
+    parser.add_argument("--scales", nargs="+", type=float, default=list(SCALES),
+                        help="Multiples of the current network size")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--data-dir", help="Keep the synthetic inputs here (default: a temporary directory)")
+    parser.add_argument("--out", help="Save the results as JSON, e.g. as a new baseline")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--max-slowdown", type=float,
+                        help="Exit with status 1 when a stage is this many times slower than the baseline")
+    args = parser.parse_args()
+
+    results = {"environment": environment(), "repeat": args.repeat, "scales": {}}
+    for scale in args.scales:
+        label = f"{scale:g}"
+        if args.data_dir:
+            results["scales"][label] = run_scale(scale, f"{args.data_dir}/{label}x", args.repeat)
+        else:
+            with tempfile.TemporaryDirectory() as data_dir:
+                results["scales"][label] = run_scale(scale, data_dir, args.repeat)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    rows = report(results, baseline)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    slower = [(scale, stage, ratio) for scale, stage, ratio in rows
+              if ratio is not None and args.max_slowdown and ratio > args.max_slowdown]
+    for scale, stage, ratio in slower:
+        print(f"{stage} at {scale}x is {ratio:.2f}x the baseline", file=sys.stderr)
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Pre-aggregated check-in rollups for the train_data dashboard.
+
+data/train_data.csv holds hourly check-ins (Jaar, Maand, Dag, Uur) with two
+reference series and the deltas against them. ``CheckinCube`` reads it once,
+in chunks, and materializes the totals at hour, day, month and year grain,
+each rolled up from the next finer one, so a dashboard query only filters a
+small pre-aggregated frame instead of grouping the raw rows on every rerun.
+Keys and counts are stored in the smallest unsigned integer type that holds
+them.
+
+Deltas are ratios, not sums: a rollup keeps the delta weighted by its
+reference, so the delta of a month is its check-ins against its reference,
+the same way the hourly values relate. An optional ``Station`` column adds a
+station dimension; the cube then also holds every grain summed over all
+stations.
+"""
+import numpy as np
+import pandas as pd
+
+CHECKINS_PATH = "data/train_data.csv"
+STATION = "Station"
+TIME_KEYS = ["Jaar", "Maand", "Dag", "Uur"]
+GRAINS = {"year": 1, "month": 2, "day": 3, "hour": 4}  # Grain -> number of time keys
+COUNTS = ["Aantal_check_ins", "Referentie_pre_COVID_19", "Referentie_vorig_jaar"]
+DELTAS = {"Delta_actueel_pre_COVID_19": "Referentie_pre_COVID_19",
+          "Delta_actueel_vorig_jaar": "Referentie_vorig_jaar"}  # Delta -> its reference
+CSV_DTYPES = {**{key: np.int32 for key in TIME_KEYS}, **{count: np.int64 for count in COUNTS},
+              **{delta: np.float64 for delta in DELTAS}, STATION: "category"}
+CHUNK_ROWS = 1_000_000
+
+
+# Rows summed per (Station,) Jaar, Maand, Dag, Uur; each delta becomes its
+# reference-weighted sum so it can be rolled up further
+def _hourly(chunk):
+    dims = [STATION] if STATION in chunk.columns else []
+    weighted = {delta: chunk[delta] * chunk[reference] for delta, reference in DELTAS.items()}
+    frame = chunk[dims + TIME_KEYS + COUNTS].assign(**weighted)
+    return frame.groupby(dims + TIME_KEYS, observed=True).sum()
+
+
+def _compact(frame):
+    frame = frame.reset_index()
+    if STATION in frame.columns:
+        frame[STATION] = frame[STATION].astype("category")
+    for column in [key for key in TIME_KEYS if key in frame.columns] + COUNTS:
+        frame[column] = pd.to_numeric(frame[column], downcast="unsigned")
+    for delta, reference in DELTAS.items():
+        reference_total = frame[reference].to_numpy(dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frame[delta] = np.where(reference_total > 0, frame[delta] / reference_total, np.nan).astype(np.float32)
+    return frame
+
+
+class CheckinCube:
+    """Check-in totals at every grain, with and without the station dimension."""
+
+    def __init__(self, hourly):
+        by_station = STATION in hourly.index.names
+        finer = {True: hourly} if by_station else {False: hourly}
+        if by_station:
+            finer[False] = hourly.groupby(level=TIME_KEYS).sum()
+        self.by_station = by_station
+        self.levels = {}
+        for grain, depth in sorted(GRAINS.items(), key=lambda item: -item[1]):
+            for per_station, frame in finer.items():
+                keys = ([STATION] if per_station else []) + TIME_KEYS[:depth]
+                if list(frame.index.names) != keys:
+                    frame = frame.groupby(level=keys, observed=True).sum()
+                finer[per_station] = frame
+                self.levels[grain, per_station] = _compact(frame)
+
+    # Stream the hourly CSV (semicolon separated, BOM prefixed) into a cube
+    @classmethod
+    def from_csv(cls, path=CHECKINS_PATH, chunksize=CHUNK_ROWS):
+        columns = pd.read_csv(path, sep=";", encoding="utf-8-sig", nrows=0).columns
+        dtypes = {column: dtype for column, dtype in CSV_DTYPES.items() if column in columns}
+        partials = [_hourly(chunk) for chunk in pd.read_csv(path, sep=";", encoding="utf-8-sig", usecols=list(dtypes),
+                                                            dtype=dtypes, chunksize=chunksize)]
+        hourly = pd.concat(partials)
+        return cls(hourly.groupby(level=list(range(hourly.index.nlevels)), observed=True).sum())
+
+    def years(self):
+        return self.levels["year", False]["Jaar"].to_numpy()
+
+    def stations(self):
+        return self.levels["year", True][STATION].unique() if self.by_station else []
+
+    # Totals at a grain ("year", "month", "day" or "hour"), filtered on key
+    # values, e.g. query("month", Jaar=2021). With station, only that
+    # station's totals; without, the totals over all stations.
+    def query(self, grain, station=None, **keys):
+        if station is not None and not self.by_station:
+            raise ValueError("the check-in data has no station column")
+        frame = self.levels[grain, station is not None]
+        mask = np.ones(len(frame), dtype=bool)
+        if station is not None:
+            mask &= (frame[STATION] == station).to_numpy()
+        for key, value in keys.items():
+            mask &= (frame[key] == value).to_numpy()
+        return frame[mask]
+
+    # Totals at a grain for the years first..last, in time order, with their
+    # start time as a datetime column Tijd (for charts)
+    def timeline(self, grain, first, last, station=None):
+        frame = self.query(grain, station)
+        frame = frame[frame["Jaar"].between(first, last).to_numpy()]
+        parts = {"year": frame["Jaar"], "month": frame.get("Maand", 1), "day": frame.get("Dag", 1),
+                 "hour": frame.get("Uur", 0)}
+        return frame.assign(Tijd=pd.to_datetime(pd.DataFrame(parts, index=frame.index)))
@@ -0,0 +1,74 @@
+"""Vectorized color lookup for line capacity and the PlotData color column.
+
+Colors are taken from precomputed lookup tables instead of being formatted
+row by row. ``capacity_rgb``/``capacity_colors`` map a whole ``capacity_norm``
+column through a yellow-to-red table of ``LUT_SIZE`` entries, or through a
+table of ``classes`` entries to quantize the lines into capacity classes
+(lines of the same class then share one color and can be drawn together).
+``rgb_string_colors`` converts the '[r, g, b]' strings of the ``color``
+column by parsing each distinct string once, and ``rgb_strings`` writes them.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+LUT_SIZE = 256
+HEX_BYTES = np.array([f'{value:02x}' for value in range(256)])
+
+
+# Yellow (first entry) to red (last entry) lookup table of `size` colors:
+# (size, 3) uint8 RGB and the matching hex strings
+@lru_cache(maxsize=None)
+def capacity_lut(size=LUT_SIZE):
+    norm = np.linspace(0, 1, size) if size > 1 else np.ones(1)
+    rgb = np.zeros((size, 3), dtype=np.uint8)
+    rgb[:, 0] = 255
+    rgb[:, 1] = np.round((1 - norm) * 255)
+    rgb.flags.writeable = False
+    return rgb, rgb_hex(rgb)
+
+
+# Lookup table index per normalized capacity. With classes, [0, 1] is split
+# into that many equal classes; NaN (seats without variation) maps to red.
+def capacity_codes(capacity_norm, classes=None):
+    norm = np.clip(np.nan_to_num(np.asarray(capacity_norm, dtype=np.float64), nan=1.0), 0, 1)
+    if classes:
+        return np.minimum((norm * classes).astype(np.intp), classes - 1)
+    # Rounded as the distance from red, which is how the green channel is rounded
+    return LUT_SIZE - 1 - np.round((1 - norm) * (LUT_SIZE - 1)).astype(np.intp)
+
+
+# (n, 3) uint8 RGB per normalized capacity
+def capacity_rgb(capacity_norm, classes=None):
+    return capacity_lut(classes or LUT_SIZE)[0][capacity_codes(capacity_norm, classes)]
+
+
+# Hex color string per normalized capacity
+def capacity_colors(capacity_norm, classes=None):
+    return capacity_lut(classes or LUT_SIZE)[1][capacity_codes(capacity_norm, classes)].tolist()
+
+
+# '#rrggbb' strings for an (n, 3) uint8 RGB array
+def rgb_hex(rgb):
+    rgb = np.asarray(rgb, dtype=np.intp).reshape(-1, 3)
+    return np.char.add(np.char.add(np.char.add('#', HEX_BYTES[rgb[:, 0]]), HEX_BYTES[rgb[:, 1]]),
+                       HEX_BYTES[rgb[:, 2]])
+
+
+# Hex color per '[r, g, b]' string with 0-1 float channels (the PlotData color
+# column). Channels are truncated to 0-255 like int(channel * 255).
+def rgb_string_colors(values):
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=False)
+    text = ' '.join(uniques.astype(str)).translate(str.maketrans('[],', '   '))
+    channels = np.fromstring(text, sep=' ').reshape(-1, 3)
+    return rgb_hex((channels * 255).astype(np.intp))[codes].tolist()
+
+
+# '[r, g, b]' strings with 0-1 float channels (the PlotData color format)
+# for an (n, 3) uint8 RGB array
+def rgb_strings(rgb):
+    channels = np.array([repr(value / 255) for value in range(256)])
+    rgb = np.asarray(rgb, dtype=np.intp).reshape(-1, 3)
+    text = np.char.add(np.char.add(np.char.add('[', channels[rgb[:, 0]]), ', '), channels[rgb[:, 1]])
+    return np.char.add(np.char.add(np.char.add(text, ', '), channels[rgb[:, 2]]), ']').tolist()
@@ -0,0 +1,83 @@
+"""Lazy, day-keyed registry of the PlotData line sets.
+
+``DatasetRegistry`` maps day names to PlotData files and loads a day into
+its ``RailNetwork`` only when that day is first asked for. Loaded days are
+keyed on the file's modification time instead of a hash of the DataFrame,
+so a rerun costs a ``stat`` per requested file, and a changed file is
+reloaded on its next request. Days are processed through ``warm_cache``, so
+a freshly started worker reads them from disk instead of re-parsing them.
+"""
+import os
+import threading
+
+from network import WEEK, RailNetwork, process_day_file
+from profiling import current
+from warm_cache import cached_frame
+
+
+class DatasetRegistry:
+    def __init__(self, paths):
+        self.paths = dict(paths)
+        self.network = RailNetwork()
+        self._loaded = {}  # day -> mtime of the file it was loaded from
+        self._line_data = {}  # (day, zoom) -> (mtimes it was built from, frame)
+        self._snapshot = None  # (loaded version, network copy)
+        self._lock = threading.Lock()  # Streamlit sessions share one registry
+
+    def __contains__(self, day):
+        return day == WEEK or day in self.paths
+
+    # Day names that can be requested, WEEK included
+    def names(self):
+        return [WEEK] + list(self.paths)
+
+    # Days whose data is needed to answer a request for day
+    def _sources(self, day):
+        if day == WEEK:
+            return list(self.paths)
+        if day not in self.paths:
+            raise KeyError(f"unknown day {day!r}; expected one of {self.names()}")
+        return [day]
+
+    # Modification times of the files behind day, without loading them;
+    # changes whenever the data served for day would change
+    def version(self, day):
+        return tuple((source, os.path.getmtime(self.paths[source])) for source in self._sources(day))
+
+    # Copy of the network and the version it is at (the days loaded with
+    # their modification times), taken together under the lock, so readers
+    # outside it never see a network another session is loading into.
+    # Later loads leave the copy unchanged.
+    def snapshot(self):
+        with self._lock:
+            version = tuple(sorted(self._loaded.items()))
+            if self._snapshot is None or self._snapshot[0] != version:
+                self._snapshot = (version, self.network.snapshot())
+            return self._snapshot
+
+    # Load (or reload, if the file changed) the given days into the network
+    def ensure_loaded(self, days):
+        mtimes = {}
+        for day in days:
+            mtime = os.path.getmtime(self.paths[day])
+            if self._loaded.get(day) != mtime:
+                self.network.add_day(day, cached_frame(self.paths[day], process_day_file))
+                self._loaded[day] = mtime
+            mtimes[day] = mtime
+        # Every level of detail is ready before the first request needs it;
+        # levels already built are only extended with new segments
+        self.network.build_levels()
+        return tuple(sorted(mtimes.items()))
+
+    # Processed line data for one day (or WEEK), loading it on first use.
+    # With a zoom level, segments come simplified to the fitting level of detail;
+    # with classes, colors are quantized into that many capacity classes.
+    def line_data(self, day, zoom=None, classes=None):
+        with self._lock:
+            version = self.ensure_loaded(self._sources(day))
+            cached = self._line_data.get((day, zoom, classes))
+            if cached is None or cached[0] != version:
+                current().miss()
+                cached = (version, self.network.line_data(day, zoom, classes))
+                self._line_data[(day, zoom, classes)] = cached
+            return cached[1]
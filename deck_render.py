@@ -0,0 +1,93 @@
+"""WebGL rendering of the line network and stations with pydeck.
+
+Leaflet draws every segment as an SVG or canvas path on the CPU, which stalls
+once several days or operators are overlaid. The layers built here are drawn
+by deck.gl on the GPU: the processed line data (the frames that folium's
+``render.add_line_layer`` takes) as a ``PathLayer`` and the stations as a
+``ScatterplotLayer``. Colors are numeric RGB arrays; ``hex_rgb`` converts the
+hex color columns of the processed frames. ``tile_layer`` draws the network
+from the vector-tile pyramid of ``vector_tiles`` instead, fetching only the
+tiles in view.
+"""
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+
+from encoding import PRECISION, round_coords
+
+TOOLTIP = {"text": "{label}"}  # Lines and stations both carry a 'label' field
+
+# pydeck sends string arguments as accessor expressions; plain string
+# options such as units need to be quoted
+PIXELS = '"pixels"'
+
+
+# (n, 3) uint8 RGB for '#rrggbb' color strings; anything else (such as
+# '#rgb' or the '[r, g, b]' strings of the PlotData color column, see
+# colormap.rgb_string_colors) raises ValueError
+def hex_rgb(hex_colors):
+    text = np.asarray(list(hex_colors), dtype=str)
+    chars = text.astype('<U7').view(np.uint32).reshape(-1, 7)[:, 1:]
+    chars = chars | 0x20  # Lower case
+    is_digit = ((chars >= ord('0')) & (chars <= ord('9'))) | ((chars >= ord('a')) & (chars <= ord('f')))
+    valid = (np.char.str_len(text) == 7) & np.char.startswith(text, '#') & is_digit.all(axis=1)
+    if not valid.all():
+        raise ValueError(f"not a '#rrggbb' color: {text[~valid][0]!r}")
+    digits = np.where(chars >= ord('a'), chars - ord('a') + 10, chars - ord('0'))
+    return (digits[:, 0::2] * 16 + digits[:, 1::2]).astype(np.uint8)
+
+
+# Path layer for a processed line frame (From, To, Seats, latlon_coords).
+# colors is an (n, 3) or (n, 4) numeric array per row; by default it is
+# converted from the hex strings in color_column.
+def line_layer(df, colors=None, color_column='color_hex', width=2.5, precision=PRECISION, layer_id=None):
+    if colors is None:
+        colors = hex_rgb(df[color_column])
+    colors = np.asarray(colors)
+
+    # Nothing to draw for segments without coordinates
+    drawn = [i for i, latlon in enumerate(df['latlon_coords']) if latlon is not None and len(latlon)]
+    segments = [np.asarray(df['latlon_coords'].iloc[i], dtype=np.float64) for i in drawn]
+    offsets = np.concatenate([[0], np.cumsum([len(segment) for segment in segments])]).astype(np.int64)
+    lonlat = round_coords(np.concatenate(segments)[:, ::-1], precision).tolist() if segments else []
+
+    data = pd.DataFrame({
+        'path': [lonlat[start:end] for start, end in zip(offsets[:-1], offsets[1:])],
+        'color': colors[drawn].tolist(),
+        'label': [f"{start} - {end}: {seats:,.0f} seats" for start, end, seats in
+                  zip(df['From'].iloc[drawn], df['To'].iloc[drawn], df['Seats'].iloc[drawn])],
+    })
+    return pdk.Layer("PathLayer", data=data, id=layer_id, get_path="path", get_color="color",
+                     get_width=width, width_units=PIXELS, cap_rounded=True, pickable=True)
+
+
+# Scatterplot layer for station rows; colors is a numeric RGB(A) array per row
+def station_layer(stations, colors, radius=2, precision=PRECISION, layer_id=None):
+    data = pd.DataFrame({
+        'position': round_coords(stations[['Lng-coord', 'Lat-coord']].to_numpy(dtype=np.float64),
+                                 precision).tolist(),
+        'color': np.asarray(colors).tolist(),
+        'label': stations['Station'].astype(str).tolist(),
+    })
+    return pdk.Layer("ScatterplotLayer", data=data, id=layer_id, get_position="position",
+                     get_fill_color="color", get_radius=radius, radius_units=PIXELS,
+                     radius_min_pixels=1, pickable=True)
+
+
+# Deck with the given layers over the CARTO light basemap (no token needed)
+def rail_deck(layers, center, zoom):
+    return pdk.Deck(layers=layers, map_style=pdk.map_styles.CARTO_LIGHT, tooltip=TOOLTIP,
+                    initial_view_state=pdk.ViewState(latitude=center[0], longitude=center[1], zoom=zoom))
+
+
+# Line layer over the vector-tile pyramid served at url ('.../{z}/{x}/{y}.pbf',
+# see vector_tiles.export_static), colored by the capacity of one day;
+# segments without service that day are hidden. bounds (west, south, east,
+# north) keeps tiles outside the network from being requested.
+def tile_layer(url, day, width=2.5, min_zoom=0, max_zoom=None, bounds=None, layer_id=None):
+    green = f"properties.g_{day}"
+    return pdk.Layer("MVTLayer", data=url, id=layer_id, min_zoom=min_zoom, max_zoom=max_zoom,
+                     extent=list(bounds) if bounds is not None else None,
+                     get_line_color=f"[255, {green}, 0, {green} >= 0 ? 255 : 0]",
+                     get_line_width=width, line_width_units=PIXELS, pickable=True,
+                     update_triggers={"getLineColor": [day]})
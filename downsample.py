@@ -0,0 +1,79 @@
+"""Server-side downsampling of long time series for charts.
+
+A chart a few hundred pixels wide cannot show more points than it has
+pixels, yet hourly data over years holds tens of thousands. ``downsample``
+reduces a series to a fixed point budget before it is sent to the browser,
+so the chart payload and render time no longer depend on the selected range:
+
+- ``"lttb"``: Largest-Triangle-Three-Buckets; per bucket, the point forming
+  the largest triangle with the previous pick and the next bucket's mean,
+  which keeps the visual shape and its peaks.
+- ``"minmax"``: the minimum and the maximum of every bucket, which keeps
+  every extreme exactly.
+
+Both keep the first and the last point and return row positions, so every
+column of a frame can follow the selection.
+"""
+import numpy as np
+
+POINT_BUDGET = 1000  # Roughly the width of a chart in pixels
+
+
+# Bucket boundaries over the interior points 1..n-2
+def _buckets(n, count):
+    return np.linspace(1, n - 1, count + 1).astype(np.intp)
+
+
+# Row positions of the LTTB selection of budget points from x, y
+def lttb(x, y, budget=POINT_BUDGET):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if budget >= n or budget < 3:
+        return np.arange(n)
+    edges = _buckets(n, budget - 2)
+    picks = np.empty(budget, dtype=np.intp)
+    picks[0], picks[-1] = 0, n - 1
+    # Mean point of every bucket, with the last point as the one after the last bucket
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(np.nan_to_num(y[1:n - 1]), edges[:-1] - 1)
+    sizes = np.diff(edges)
+    next_x = np.append(sums_x[1:] / sizes[1:], x[-1])
+    next_y = np.append(sums_y[1:] / sizes[1:], y[-1])
+    previous = 0
+    for bucket in range(budget - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Twice the triangle area (previous pick, candidate, next bucket mean)
+        areas = np.abs((x[previous] - next_x[bucket]) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y[bucket] - y[previous]))
+        previous = start + int(np.nanargmax(areas)) if not np.isnan(areas).all() else start
+        picks[bucket + 1] = previous
+    return picks
+
+
+# Row positions of the minimum and maximum of every bucket, about budget points
+def minmax(y, budget=POINT_BUDGET):
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if budget >= n or budget < 4:
+        return np.arange(n)
+    edges = _buckets(n, (budget - 2) // 2)
+    bucket = np.repeat(np.arange(len(edges) - 1), np.diff(edges))
+    # Order the interior by (bucket, value); the first and last of a bucket are its extremes
+    values = y[1:n - 1]
+    order = np.lexsort((np.where(np.isnan(values), np.inf, values), bucket))
+    lows = order[edges[:-1] - 1]
+    highs = order[edges[1:] - 2]
+    return np.unique(np.concatenate([[0], lows + 1, highs + 1, [n - 1]]))
+
+
+# Rows of df reduced to the point budget along column x. Each y column makes
+# its own selection and the union is kept, so no series loses its peaks.
+def downsample(df, x, columns, budget=POINT_BUDGET, method="lttb"):
+    if len(df) <= budget:
+        return df
+    keys = df[x].to_numpy()
+    keys = keys.astype("datetime64[ns]").astype(np.int64) if np.issubdtype(keys.dtype, np.datetime64) else keys
+    rows = [lttb(keys, df[column].to_numpy(), budget) if method == "lttb" else minmax(df[column].to_numpy(), budget)
+            for column in columns]
+    return df.iloc[np.unique(np.concatenate(rows))]
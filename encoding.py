@@ -0,0 +1,45 @@
+"""Compact coordinate encodings for the map payload.
+
+Coordinates written at full float precision take 15-17 significant digits
+per number. ``round_coords`` limits them to a fixed number of decimals
+(5 decimals is about 1 m), and ``encode_polylines`` writes whole segments in
+Google's encoded polyline format, which the browser decodes.
+"""
+import numpy as np
+
+PRECISION = 5  # Decimals of a degree; 5 is about 1 m
+
+
+# Round coordinates to a number of decimals
+def round_coords(coords, precision=PRECISION):
+    return np.round(np.asarray(coords, dtype=np.float64), precision)
+
+
+# Google encoded polyline strings for many segments at once. latlon is one
+# (n_points, 2) lat/lon buffer and segment i spans latlon[offsets[i]:offsets[i + 1]].
+# The client decoder uses 32-bit integers, so keep precision at 6 or below.
+def encode_polylines(latlon, offsets, precision=PRECISION):
+    offsets = np.asarray(offsets, dtype=np.int64)
+    scaled = np.round(np.asarray(latlon, dtype=np.float64).reshape(-1, 2) * 10 ** precision).astype(np.int64)
+    if not len(scaled):
+        return [""] * (len(offsets) - 1)
+
+    # Every segment starts from (0, 0); later points are deltas to the previous one
+    deltas = np.diff(scaled, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+    starts = offsets[:-1][offsets[:-1] < offsets[1:]]
+    deltas[starts] = scaled[starts]
+    values = deltas.ravel()
+    values = np.where(values < 0, ~(values << 1), values << 1)
+
+    # Split each value into 5-bit chunks, lowest first, flagging continuation
+    shifts = 5 * np.arange(7, dtype=np.int64)
+    remaining = values[:, None] >> shifts
+    used = (remaining > 0)
+    used[:, 0] = True
+    more = np.zeros_like(used)
+    more[:, :-1] = used[:, 1:]
+    chars = ((remaining & 0x1f) | np.where(more, 0x20, 0)) + 63
+
+    text = chars[used].astype(np.uint8).tobytes().decode("ascii")
+    bounds = np.concatenate([[0], np.cumsum(used.sum(axis=1))])[2 * offsets]
+    return [text[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
@@ -0,0 +1,52 @@
+"""Shared WKT LINESTRING parsing for the PlotData ``geometry`` column.
+
+``parse_linestrings`` handles a whole column at once: one regex pass picks
+out the coordinate text of every valid row and a single ``np.fromstring``
+turns the concatenated text into a contiguous float64 buffer. Segments are
+addressed through an offsets array, the same layout ``line_store`` writes.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+_NUMBER = r'-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?'
+_POINT = rf'{_NUMBER}\s+{_NUMBER}'
+_LINESTRING = rf'^\s*LINESTRING\s*\(\s*({_POINT}(?:\s*,\s*{_POINT})*)\s*\)\s*$'
+
+
+# Parse a Series of LINESTRING WKT into (coords, offsets, valid).
+# coords is a (n_points, 2) float64 buffer, offsets has one entry per valid
+# row plus one, and valid marks the rows that held a usable LINESTRING.
+# Empty, missing and malformed geometries are not valid.
+def parse_linestrings(geometry):
+    body = pd.Series(geometry).astype("string").str.extract(_LINESTRING, flags=re.IGNORECASE)[0]
+    valid = body.notna().to_numpy()
+    body = body[valid]
+
+    counts = body.str.count(',').to_numpy(dtype=np.int64) + 1
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    text = ' '.join(body.tolist()).replace(',', ' ')
+    values = np.fromstring(text, sep=' ') if text else np.empty(0)
+    if len(values) != 2 * offsets[-1]:
+        raise ValueError("geometry column could not be parsed consistently")
+    return values.reshape(-1, 2), offsets, valid
+
+
+# Per-row coordinate arrays (views into one buffer), aligned with geometry.
+# Rows without a valid LINESTRING get None, or an empty array if keep_empty.
+def coords_column(geometry, keep_empty=False):
+    geometry = pd.Series(geometry)
+    coords, offsets, valid = parse_linestrings(geometry)
+    column = [np.empty((0, 2)) if keep_empty else None for _ in range(len(geometry))]
+    segments = np.split(coords, offsets[1:-1]) if len(offsets) > 1 else []
+    for position, segment in zip(np.flatnonzero(valid), segments):
+        column[position] = segment
+    return pd.Series(column, index=geometry.index, dtype=object)
+
+
+# First and last point of every segment, as two (n_segments, 2) arrays
+def segment_endpoints(coords, offsets):
+    return coords[offsets[:-1]], coords[offsets[1:] - 1]
@@ -0,0 +1,105 @@
+"""Bounded, memory-accounted LRU cache for rendered map views.
+
+The set of map views is small: a line set times the subsets of the station
+filters. ``RenderCache`` keeps the final rendered HTML (and whatever else a
+view needs, such as legend values) per selection key, evicting the least
+recently used views once the cached values exceed ``max_bytes``. A repeat
+view then costs a dictionary lookup instead of a full folium render.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = int(float(os.environ.get("MAP_CACHE_MB", 64)) * 2 ** 20)
+
+
+# Approximate memory held by a cached value: strings and bytes at their real
+# size, containers as the sum of their items
+def size_of(value):
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(size_of(k) + size_of(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(size_of(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class RenderCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()  # Streamlit sessions share one cache
+        self._rendering = {}  # key -> lock held while that view renders
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._lookup(key, default)
+
+    # get() for a caller that holds the lock
+    def _lookup(self, key, default):
+        if key not in self._entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key][0]
+
+    def put(self, key, value):
+        size = size_of(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return value  # Would evict everything and still not fit
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+        return value
+
+    # Cached value for key, or render() stored under key on a miss. Sessions
+    # that miss the same key at once render it once: the others wait for the
+    # first and then take its value from the cache.
+    def get_or_render(self, key, render):
+        missing = object()
+        with self._lock:
+            value = self._lookup(key, missing)
+            if value is not missing:
+                return value
+            rendering = self._rendering.setdefault(key, threading.Lock())
+        with rendering:
+            with self._lock:
+                if key in self._entries:  # Rendered while this session waited
+                    self._entries.move_to_end(key)
+                    return self._entries[key][0]
+            try:
+                return self.put(key, render())
+            finally:
+                with self._lock:
+                    self._rendering.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,159 @@
+"""Precompiled columnar store for the PlotData line files.
+
+The PlotData CSVs keep every segment as a ``LINESTRING (...)`` text blob, so
+each app process used to spend its cold start parsing WKT. ``build_store``
+does that parsing once, offline, and writes one directory of ``.npy`` arrays
+per CSV:
+
+    coords.npy   float64 (n_points, 2) UTM coordinates of all segments
+    offsets.npy  int64 (n_segments + 1) start of each segment in coords
+    from.npy     str   From station code per segment
+    to.npy       str   To station code per segment
+    seats.npy    float64 Seats per segment
+    color.npy    str   original color column (empty when absent)
+
+``load_store`` memory-maps those arrays, so opening a store is a page-in
+instead of a parse. Build the stores with:
+
+    python line_store.py data/PlotData*.csv
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from geometry import parse_linestrings
+
+STORE_ROOT = "LineStore"
+STORE_VERSION = 3
+ARRAYS = ("coords", "offsets", "from", "to", "seats", "color")
+PLOTDATA_NA_VALUES = {'Seats': [''], 'geometry': ['']}
+
+
+@dataclass
+class LineStore:
+    coords: np.ndarray
+    offsets: np.ndarray
+    from_codes: np.ndarray
+    to_codes: np.ndarray
+    seats: np.ndarray
+    color: np.ndarray
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    # Coordinates of segment i, as a view into the shared buffer
+    def segment(self, i):
+        return self.coords[self.offsets[i]:self.offsets[i + 1]]
+
+
+# Directory that holds the store for a given PlotData CSV
+def store_path_for(csv_path, store_root=STORE_ROOT):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(store_root, name)
+
+
+# Read a PlotData CSV. Station codes are kept verbatim: "NA" (Nieuw
+# Amsterdam) is a real code, not a missing value.
+def read_plotdata_csv(csv_path):
+    return pd.read_csv(csv_path, dtype={'From': str, 'To': str},
+                       keep_default_na=False, na_values=PLOTDATA_NA_VALUES)
+
+
+# Fixed-width unicode array sized to the longest value, so it can be memory-mapped
+def _string_array(values):
+    return np.array(values.astype(str).tolist(), dtype=str)
+
+
+# Parse a PlotData CSV and write its columnar store to out_dir
+def build_store(csv_path, out_dir=None):
+    out_dir = out_dir or store_path_for(csv_path)
+    df = read_plotdata_csv(csv_path)
+    coords, offsets, valid = parse_linestrings(df['geometry'])
+    # Segments without coordinates are dropped, as process_line_data does
+    df = df[valid]
+
+    arrays = {
+        "coords": coords,
+        "offsets": offsets,
+        "from": _string_array(df['From']),
+        "to": _string_array(df['To']),
+        "seats": df['Seats'].to_numpy(dtype=np.float64),
+        "color": _string_array(df['color'] if 'color' in df.columns
+                               else pd.Series("", index=df.index)),
+    }
+
+    # Write next to the target and swap in, so readers never see half a store
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_dir, name + ".npy"), values)
+    meta = {"version": STORE_VERSION, "source": os.path.abspath(csv_path),
+            "source_mtime": os.path.getmtime(csv_path), "segments": len(df)}
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+
+# Memory-map a store written by build_store
+def load_store(store_dir):
+    arrays = {name: np.load(os.path.join(store_dir, name + ".npy"), mmap_mode='r')
+              for name in ARRAYS}
+    return LineStore(coords=arrays["coords"], offsets=arrays["offsets"],
+                     from_codes=arrays["from"], to_codes=arrays["to"],
+                     seats=arrays["seats"], color=arrays["color"])
+
+
+# True if store_dir holds a current store for csv_path
+def is_fresh(store_dir, csv_path):
+    try:
+        with open(os.path.join(store_dir, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (meta.get("version") == STORE_VERSION
+            and meta.get("source_mtime") == os.path.getmtime(csv_path))
+
+
+# PlotData-shaped frame backed by a store; 'coords' holds views into the buffer
+def store_to_frame(store):
+    df = pd.DataFrame({
+        'From': store.from_codes,
+        'To': store.to_codes,
+        'Seats': store.seats,
+    })
+    if len(store) and (store.color != "").all():
+        df['color'] = store.color
+    df['coords'] = [store.segment(i) for i in range(len(store))]
+    return df
+
+
+# Read a PlotData file, from its precompiled store when one is available
+def read_line_data(csv_path, store_root=STORE_ROOT):
+    store_dir = store_path_for(csv_path, store_root)
+    if is_fresh(store_dir, csv_path):
+        return store_to_frame(load_store(store_dir))
+    return read_plotdata_csv(csv_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build columnar stores for PlotData CSV files.")
+    parser.add_argument("csv", nargs="*", help="PlotData CSV files (default: data/PlotData*.csv)")
+    parser.add_argument("--store-root", default=STORE_ROOT)
+    args = parser.parse_args()
+
+    for csv_path in args.csv or sorted(glob.glob("data/PlotData*.csv")):
+        out_dir = build_store(csv_path, store_path_for(csv_path, args.store_root))
+        print(f"{csv_path} -> {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,97 @@
+import os
 import pandas as pd
-import re
-from pyproj import Transformer
 import folium
 import streamlit as st
-from matplotlib import colors
 import numpy as np
+from colormap import capacity_colors, capacity_rgb
+from datasets import DatasetRegistry
+from deck_render import hex_rgb, line_layer, rail_deck, station_layer, tile_layer
+from html_cache import RenderCache
+from network import DAYS, WEEK
+from profiling import Profiler, current, profiling_enabled, show_panel
+from rail_map import rail_map
+from regions import with_regions
+from spatial_index import NetworkIndex
+from station_index import StationIndex
+from vector_tiles import STATIC_URL, TILES_PATH, export_static, stale_reasons
+from render import add_line_layer, add_station_layer
+
+# Day files that make up the network; week totals are computed from them
+DAY_FILES = {day: f"OutputData/PlotData{day}.csv" for day in DAYS}
+
+# Line set options in the sidebar, mapped to a column of the seats matrix
+LINE_SETS = {'PlotDataHeleWeek': WEEK, 'PlotDataMonday': 'Monday', 'PlotDataTuesday': 'Tuesday',
+             'PlotDataWednesday': 'Wednesday', 'PlotDataThursday': 'Thursday', 'PlotDataFriday': 'Friday',
+             'PlotDataSaturday': 'Saturday', 'PlotDataSunday': 'Sunday'}
+
+# Map payload: coordinate decimals (5 is about 1 m), and whether the lines are
+# sent as encoded polylines that the browser decodes
+COORDINATE_PRECISION = 5
+ENCODE_LINES = True
+
+# How the map is drawn:
+# - "persistent": the persistent Leaflet component, which only receives what
+#   changed on a rerun
+# - "folium": a full folium document per selection, cached as HTML
+# - "deck": pydeck (deck.gl) layers drawn on the GPU
+# - "tiles": deck.gl over the vector-tile pyramid (build it with
+#   `python vector_tiles.py`), fetching only the tiles in view
+MAP_RENDERER = "persistent"
+
+# Number of capacity classes the line colors are quantized into; None for a
+# continuous yellow-to-red gradient
+CAPACITY_CLASSES = None
+
+# Registry shared by all sessions; a day is loaded into the network on first selection
+@st.cache_resource
+def get_registry():
+    return DatasetRegistry(DAY_FILES)
+
+# Vector-tile pyramid checked against the day files and unpacked to the
+# static folder Streamlit serves; (metadata, None) when it can be served,
+# (None, reasons) when not. Redone when the pyramid or a day file changes.
+@st.cache_resource
+def get_tiles(file_times):
+    reasons = stale_reasons(TILES_PATH, DAY_FILES)
+    if reasons:
+        return None, reasons
+    return export_static(TILES_PATH), None
+
+def tile_file_times():
+    return tuple(os.path.getmtime(path) if os.path.exists(path) else None
+                 for path in [TILES_PATH, *DAY_FILES.values()])
+
+# Spatial index over a network snapshot and the stations; rebuilt when a
+# day is added to or reloaded into the network. The version must come from
+# the same registry.snapshot() call as the network.
+@st.cache_resource
+def get_network_index(_network, _stations, network_version):
+    return NetworkIndex(_network, _stations)
+
+# Rendered map views shared by all sessions, capped at MAP_CACHE_MB (default 64)
+@st.cache_resource
+def get_render_cache():
+    return RenderCache()
 
-# Load the CSV data for multiple line sets (for each day of the week)
-@st.cache_data
-def load_data():
-    # Load datasets for each day of the week
-    df_hele_week = pd.read_csv("OutputData/PlotDataWeek.csv")
-    df_monday = pd.read_csv("OutputData/PlotDataMonday.csv")
-    df_tuesday = pd.read_csv("OutputData/PlotDataTuesday.csv")
-    df_wednesday = pd.read_csv("OutputData/PlotDataWednesday.csv")
-    df_thursday = pd.read_csv("OutputData/PlotDataThursday.csv")
-    df_friday = pd.read_csv("OutputData/PlotDataFriday.csv")
-    df_saturday = pd.read_csv("OutputData/PlotDataSaturday.csv")
-    df_sunday = pd.read_csv("OutputData/PlotDataSunday.csv")
-    
-    stations = pd.read_csv("Streamlit_data/Randstad-0.0.csv")
-    
-    return (df_hele_week, df_monday, df_tuesday, df_wednesday, 
-            df_thursday, df_friday, df_saturday, df_sunday, stations)
-
-# Extract coordinates function with added check for empty geometry
-def extract_coords(geometry_str):
-    coords = re.findall(r'(-?\d+\.\d+)\s(-?\d+\.\d+)', geometry_str)
-    if not coords:  # If coords is empty, return None
-        return None
-    return [tuple(map(float, coord)) for coord in coords]
-
-# Precompute data processing for lines
 @st.cache_data
-def process_line_data(df):
-    df['coords'] = df['geometry'].apply(extract_coords)
-    df = df.dropna(subset=['coords'])  # Drop rows where 'coords' is None
-
-    # Normalize seat capacity to use for color scaling
-    df['capacity_norm'] = (df['Seats'] - df['Seats'].min()) / (df['Seats'].max() - df['Seats'].min())
-    
-    transformer = Transformer.from_crs("epsg:32631", "epsg:4326")
-    
-    def convert_coords_to_latlon(coords):
-        x_vals, y_vals = zip(*coords)
-        lat_vals, lon_vals = transformer.transform(x_vals, y_vals)
-        return list(zip(lat_vals, lon_vals))
-
-    df['latlon_coords'] = df['coords'].apply(lambda x: convert_coords_to_latlon(x) if x is not None else None)
-    
-    return df.dropna(subset=['latlon_coords'])  # Drop rows where 'latlon_coords' could not be computed
-
-# Generate a gradient color based on normalized capacity
+def load_stations():
+    # Region flags the file lacks are computed here; shipped flags are kept
+    return with_regions(pd.read_csv("Streamlit_data/Randstad-0.0.csv"))
+
+# Stations indexed by (Randstad, Type code), built once for all sessions
+@st.cache_resource
+def get_station_index():
+    current().miss()
+    return StationIndex(load_stations())
+
+# Generate a gradient color based on normalized capacity, from yellow (low) to red (high)
 def capacity_color(norm_value):
-    # Define the color gradient from yellow (low) to red (high)
-    return colors.to_hex((1, 1 - norm_value, 0))  # Interpolates between yellow (0) and red (1)
+    return capacity_colors([norm_value], CAPACITY_CLASSES)[0]
 
 # Get color value for specific seat capacity
 def get_color_for_seat_value(seat_value, min_seat, max_seat):
     if max_seat == min_seat:  # Avoid division by zero
-        return colors.to_hex((1, 0, 0))  # Return red if no variation in data
+        return capacity_color(1.0)  # Return red if no variation in data
     norm_value = (seat_value - min_seat) / (max_seat - min_seat)
     return capacity_color(norm_value)
 
@@ -70,64 +102,57 @@ def draw_map(initial_center, initial_zoom):
     m = folium.Map(location=initial_center, zoom_start=initial_zoom, control_scale=True, tiles='CartoDB positron')
     return m
 
-# Add lines to the map with color based on seat capacity
+# Add lines to the map with color based on seat capacity, as a single layer
 def add_lines_to_map(m, df):
-    for _, row in df.iterrows():
-        latlon_coords = row['latlon_coords']
-        norm_capacity = row['capacity_norm']
-        color = capacity_color(norm_capacity)
-        folium.PolyLine(latlon_coords, color=color, weight=2.5, opacity=1).add_to(m)
-    return m
+    # Colors are precomputed from capacity_norm
+    return add_line_layer(m, df, precision=COORDINATE_PRECISION, encoded=ENCODE_LINES)
 
-# Add station markers based on selection
-def add_stations_to_map(m, stations, selected_types, selected_type_codes):
+# Stations matching the selection
+def select_stations(station_index, selected_types, selected_type_codes):
     if not selected_types and not selected_type_codes:
         # Default: no stations are shown if nothing is selected
-        return m
+        return station_index.stations.iloc[:0]
 
-    for _, row in stations.iterrows():
-        # If both Randstad type and station type are selected
-        if selected_types and selected_type_codes:
-            if row['Randstad'] in selected_types and row['Type code'] in selected_type_codes:
-                add_station_marker(m, row)
+    # A filter that has nothing selected does not restrict the stations
+    return station_index.select(selected_types or None, selected_type_codes or None)
 
-        # If no Randstad type selected, show all stations of the selected station type(s)
-        elif not selected_types and selected_type_codes:
-            if row['Type code'] in selected_type_codes:
-                add_station_marker(m, row)
+# Marker color per station, based on Randstad type
+def station_colors(stations):
+    return np.where(stations['Randstad'] == 0.0, '#bbbfb5', '#868a81')
 
-        # If no station type selected, show all stations for the selected Randstad value(s)
-        elif selected_types and not selected_type_codes:
-            if row['Randstad'] in selected_types:
-                add_station_marker(m, row)
+# Add station markers based on selection, as one layer
+def add_stations_to_map(m, station_index, selected_types, selected_type_codes):
+    selected = select_stations(station_index, selected_types, selected_type_codes)
+    return add_station_layer(m, selected, station_colors(selected), precision=COORDINATE_PRECISION)
 
-    return m
+# Row and vertex counts of a processed line frame, for the profiler
+def line_stats(df):
+    return {"rows": len(df), "vertices": int(df['latlon_coords'].map(len).sum())}
 
-def add_station_marker(m, row):
-    # Determine the color based on Randstad type
-    color = '#bbbfb5' if row['Randstad'] == 0.0 else '#868a81'
-    
-    # Add a visible small marker
-    folium.CircleMarker(
-        location=[row['Lat-coord'], row['Lng-coord']],
-        radius=1,  # Keep the bullet size small
-        color=color,
-        fill=True,
-        fill_opacity=1,
-        popup=row['Station'],  # Show station name on click
-        tooltip=row['Station']  # Show station name on hover
-    ).add_to(m)
-    
-    # Add an invisible, larger clickable area to make selection easier
-    folium.CircleMarker(
-        location=[row['Lat-coord'], row['Lng-coord']],
-        radius=8,  # Larger radius for easier selection
-        color=color,
-        fill=True,
-        fill_opacity=0,  # Make the clickable area invisible
-        popup=row['Station'],
-        weight=row['Type code']  # No border for a seamless look
-    ).add_to(m)
+# Render the map for one selection: the HTML plus the legend's seat range (x1000)
+def render_map(registry, station_index, line_set, station_type, selected_type_codes, initial_center, initial_zoom):
+    profiler = current()
+    profiler.miss()
+    with profiler.span("build_map"):
+        # Draw the initial map
+        folium_map = draw_map(initial_center, initial_zoom)
+
+        # Add the selected line set to the map; only the selected day is loaded.
+        # The folium map can be zoomed in without a rerun, so it gets full detail.
+        with profiler.span("line_data", cached=True) as span:
+            df_selected = registry.line_data(LINE_SETS[line_set], classes=CAPACITY_CLASSES)
+            if profiler.enabled:
+                span.update(line_stats(df_selected))
+        folium_map = add_lines_to_map(folium_map, df_selected)
+        min_seat = int(df_selected['Seats'].min() // 1000)
+        max_seat = int(df_selected['Seats'].max() // 1000)
+        # Add selected station types to the map (if any)
+        folium_map = add_stations_to_map(folium_map, station_index, station_type, selected_type_codes)
+
+    with profiler.span("repr_html") as span:
+        map_html = folium_map._repr_html_()
+        span["bytes"] = len(map_html)
+    return map_html, min_seat, max_seat
 
 # Main function for Streamlit
 def main():
@@ -135,19 +160,13 @@ def main():
     st.write("The map below shows the intensity of each piece of rail in The Netherlands. The map is adjustable. \
               Different station types can be selected, as well as different transport operators.")
 
-    # Load and process data
-    (df_hele_week, df_monday, df_tuesday, df_wednesday, 
-     df_thursday, df_friday, df_saturday, df_sunday, stations) = load_data()
-
-    # Process each DataFrame
-    df_hele_week = process_line_data(df_hele_week)
-    df_monday = process_line_data(df_monday)
-    df_tuesday = process_line_data(df_tuesday)
-    df_wednesday = process_line_data(df_wednesday)
-    df_thursday = process_line_data(df_thursday)
-    df_friday = process_line_data(df_friday)
-    df_saturday = process_line_data(df_saturday)
-    df_sunday = process_line_data(df_sunday)
+    # Look up the day registry and load the stations
+    profiler = current()
+    registry = get_registry()
+    with profiler.span("stations", cached=True) as span:
+        station_index = get_station_index()
+        span["rows"] = len(station_index)
+    stations = station_index.stations
 
     # Get the initial map center and zoom level (Utrecht coordinates)
     initial_center = [52.0907, 6.1214]  # Utrecht coordinates
@@ -156,9 +175,7 @@ def main():
     # Sidebar for line set selection (for each day of the week)
     line_set = st.sidebar.selectbox(
         "Select day of the week to display:",
-        options=['PlotDataHeleWeek', 'PlotDataMonday', 'PlotDataTuesday', 
-                 'PlotDataWednesday', 'PlotDataThursday', 'PlotDataFriday', 
-                 'PlotDataSaturday', 'PlotDataSunday'],
+        options=list(LINE_SETS),
         format_func=lambda x: x.replace("PlotData", "Data for ")  # Custom display names
     )
 
@@ -179,47 +196,78 @@ def main():
         default=[]
     )
 
-    # Draw the initial map
-    folium_map = draw_map(initial_center, initial_zoom)
-
-    # Add the selected line set to the map
-    if line_set == 'PlotDataHeleWeek':
-        folium_map = add_lines_to_map(folium_map, df_hele_week)
-        min_seat = int(df_hele_week['Seats'].min() // 1000)
-        max_seat = int(df_hele_week['Seats'].max() // 1000)
-    elif line_set == 'PlotDataMonday':
-        folium_map = add_lines_to_map(folium_map, df_monday)
-        min_seat = int(df_monday['Seats'].min() // 1000)
-        max_seat = int(df_monday['Seats'].max() // 1000)
-    elif line_set == 'PlotDataTuesday':
-        folium_map = add_lines_to_map(folium_map, df_tuesday)
-        min_seat = int(df_tuesday['Seats'].min() // 1000)
-        max_seat = int(df_tuesday['Seats'].max() // 1000)
-    elif line_set == 'PlotDataWednesday':
-        folium_map = add_lines_to_map(folium_map, df_wednesday)
-        min_seat = int(df_wednesday['Seats'].min() // 1000)
-        max_seat = int(df_wednesday['Seats'].max() // 1000)
-    elif line_set == 'PlotDataThursday':
-        folium_map = add_lines_to_map(folium_map, df_thursday)
-        min_seat = int(df_thursday['Seats'].min() // 1000)
-        max_seat = int(df_thursday['Seats'].max() // 1000)
-    elif line_set == 'PlotDataFriday':
-        folium_map = add_lines_to_map(folium_map, df_friday)
-        min_seat = int(df_friday['Seats'].min() // 1000)
-        max_seat = int(df_friday['Seats'].max() // 1000)
-    elif line_set == 'PlotDataSaturday':
-        folium_map = add_lines_to_map(folium_map, df_saturday)
-        min_seat = int(df_saturday['Seats'].min() // 1000)
-        max_seat = int(df_saturday['Seats'].max() // 1000)
-    elif line_set == 'PlotDataSunday':
-        folium_map = add_lines_to_map(folium_map, df_sunday)
-        min_seat = int(df_sunday['Seats'].min() // 1000)
-        max_seat = int(df_sunday['Seats'].max() // 1000)
-    # Add selected station types to the map (if any)
-    folium_map = add_stations_to_map(folium_map, stations, station_type, selected_type_codes)
-
-    # Display the map in Streamlit
-    st.components.v1.html(folium_map._repr_html_(), height=600)
+    if MAP_RENDERER == "persistent":
+        # The persistent map keeps its Leaflet instance across reruns: it gets the
+        # base network once, then only the selected day's colors and stations.
+        # rail_map picks the level of detail for the zoom the map last reported;
+        # the line data here only supplies seats and colors.
+        with profiler.span("line_data", cached=True) as span:
+            df_selected = registry.line_data(LINE_SETS[line_set], classes=CAPACITY_CLASSES)
+            if profiler.enabled:
+                span.update(line_stats(df_selected))
+        selected_stations = select_stations(station_index, station_type, selected_type_codes)
+        network_version, network = registry.snapshot()
+        with profiler.span("rail_map", stations=len(selected_stations)):
+            view = rail_map(network, df_selected, selected_stations, station_colors(selected_stations),
+                            initial_center, initial_zoom, precision=COORDINATE_PRECISION)
+
+        # Answer "what is the load here?" for the last clicked point
+        if view and view.get("click"):
+            index = get_network_index(network, stations, network_version)
+            lat, lon = view["click"]
+            segment = index.nearest_segment(lat, lon, day=LINE_SETS[line_set], max_distance=2000)
+            station = index.nearest_stations(lat, lon).iloc[0]
+            if segment is not None:
+                seats = "no service" if pd.isna(segment['Seats']) else f"{segment['Seats']:,.0f} seats"
+                st.sidebar.markdown(f"**Track {segment['From']} - {segment['To']}**: {seats} "
+                                    f"({segment['distance']:,.0f} m away)")
+            through = index.station_seats(LINE_SETS[line_set])[station.name]
+            st.sidebar.markdown(f"**Nearest station**: {station['Station']} ({station['distance']:,.0f} m away), "
+                                f"{through:,.0f} seats through it")
+        min_seat = int(df_selected['Seats'].min() // 1000)
+        max_seat = int(df_selected['Seats'].max() // 1000)
+    elif MAP_RENDERER == "deck":
+        # The GPU draws the full-detail network; colors go in as RGB arrays
+        with profiler.span("line_data", cached=True) as span:
+            df_selected = registry.line_data(LINE_SETS[line_set], classes=CAPACITY_CLASSES)
+            if profiler.enabled:
+                span.update(line_stats(df_selected))
+        selected_stations = select_stations(station_index, station_type, selected_type_codes)
+        with profiler.span("deck", stations=len(selected_stations)):
+            layers = [line_layer(df_selected, capacity_rgb(df_selected['capacity_norm'], CAPACITY_CLASSES), precision=COORDINATE_PRECISION),
+                      station_layer(selected_stations, hex_rgb(station_colors(selected_stations)),
+                                    precision=COORDINATE_PRECISION)]
+            st.pydeck_chart(rail_deck(layers, initial_center, initial_zoom), height=600)
+        min_seat = int(df_selected['Seats'].min() // 1000)
+        max_seat = int(df_selected['Seats'].max() // 1000)
+    elif MAP_RENDERER == "tiles":
+        metadata, reasons = get_tiles(tile_file_times())
+        if reasons:
+            st.error(f"The vector tiles cannot be served: {'; '.join(reasons)}. Rebuild them with "
+                     f"`python vector_tiles.py {' '.join(DAY_FILES.values())}`.")
+            return
+        # Only the tiles in view are fetched; the day only changes their coloring
+        selected_stations = select_stations(station_index, station_type, selected_type_codes)
+        layers = [tile_layer(STATIC_URL, LINE_SETS[line_set], min_zoom=int(metadata["minzoom"]),
+                             max_zoom=int(metadata["maxzoom"]), bounds=map(float, metadata["bounds"].split(","))),
+                  station_layer(selected_stations, hex_rgb(station_colors(selected_stations)),
+                                precision=COORDINATE_PRECISION)]
+        st.pydeck_chart(rail_deck(layers, initial_center, initial_zoom), height=600)
+        # The seat range comes with the tiles, so the day is not loaded
+        min_seat, max_seat = (int(seats // 1000) for seats in metadata["seats"][LINE_SETS[line_set]])
+    else:
+        # Rendered views are cached per selection; the data version keeps stale views out
+        view_key = (line_set, tuple(sorted(station_type)), tuple(sorted(selected_type_codes)),
+                    registry.version(LINE_SETS[line_set]))
+        with profiler.span("render", cached=True) as span:
+            map_html, min_seat, max_seat = get_render_cache().get_or_render(
+                view_key,
+                lambda: render_map(registry, station_index, line_set, station_type, selected_type_codes,
+                                   initial_center, initial_zoom))
+            span["bytes"] = len(map_html)
+
+        # Display the map in Streamlit
+        st.components.v1.html(map_html, height=600)
 
     # Create a legend on the right side of the map
     #min_seat = int(df_hele_week['Seats'].min() // 1000)  # Deel door 1000 en rond naar beneden
@@ -269,6 +317,8 @@ def main():
             third_seat_value=third_seat_value, fourth_seat_value=fourth_seat_value)
 
     st.markdown(legend_html, unsafe_allow_html=True)
-# Run the app
+# Run the app; with profiling on, every stage of the rerun is timed
 if __name__ == "__main__":
-    main()
+    with Profiler(profiling_enabled(), app="map_app") as profiler:
+        main()
+        show_panel(profiler)
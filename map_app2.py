@@ -1,44 +1,33 @@
 import streamlit as st
 import folium
 import pandas as pd
-import re
-from pyproj import Proj, transform
+import numpy as np
 from io import BytesIO
-
-# Define the projection for your coordinates (UTM Zone 31N for the Netherlands)
-in_proj = Proj(init='epsg:32631')  # UTM projection for the Netherlands
-out_proj = Proj(init='epsg:4326')  # WGS84 (lat/lon)
+from colormap import rgb_string_colors
+from geometry import parse_linestrings, segment_endpoints
+from projection import project_coords
+from render import add_line_layer
 
 # Sample data with geometry strings
 df = pd.read_csv("data/PlotDataHeleWeek.csv")
 
-# Function to extract first and last coordinates using regex
-def extract_first_last_coords(geometry_str):
-    # Regular expression to extract all coordinate pairs
-    coords = re.findall(r'(-?\d+\.\d+)\s(-?\d+\.\d+)', geometry_str)
-    
-    # Extract the first and last coordinates
-    first_coord = tuple(map(float, coords[0]))
-    last_coord = tuple(map(float, coords[-1]))
-    
-    return first_coord, last_coord
+# Parse the whole geometry column once and keep the first and last coordinates
+coords, offsets, valid = parse_linestrings(df['geometry'])
+df = df[valid].copy()  # Drop rows without a usable geometry
+first_coords, last_coords = segment_endpoints(coords, offsets)
 
-# Apply the function to extract first and last coordinates
-df[['first_coord', 'last_coord']] = pd.DataFrame(df['geometry'].apply(extract_first_last_coords).tolist(), index=df.index)
+# Convert all endpoints from UTM Zone 31N to lat/lon in one projection call
+latlon = project_coords(np.concatenate([first_coords, last_coords]))
+df['first_coord'] = list(map(tuple, latlon[:len(df)]))
+df['last_coord'] = list(map(tuple, latlon[len(df):]))
 
 # Drop the original 'geometry' column as it's no longer needed
 df = df.drop(columns=['geometry'])
 
-# Function to convert projected coordinates to lat/lon
-def convert_to_latlon(x, y):
-    lon, lat = transform(in_proj, out_proj, x, y)
-    return lat, lon
-
 # Function to draw a line on the map between coordinates and color them
 def draw_map():
-    # Convert the first set of coordinates to lat/lon for map centering
-    first_coord = df['first_coord'][0]
-    first_coord_latlon = convert_to_latlon(first_coord[0], first_coord[1])
+    # The first coordinate (already in lat/lon) is used for map centering
+    first_coord_latlon = df['first_coord'].iloc[0]
     
     # Initialize a folium map centered on the first converted coordinate (lat/lon)
     m = folium.Map(location=first_coord_latlon, zoom_start=12, control_scale=True)
@@ -46,18 +35,13 @@ def draw_map():
     # Add white background using custom tile layer
     folium.TileLayer('cartodb positron').add_to(m)
 
-    # Iterate over the rows and add lines
-    for i, row in df.iterrows():
-        # Convert first and last coordinates to lat/lon
-        first_coord_latlon = convert_to_latlon(row['first_coord'][0], row['first_coord'][1])
-        last_coord_latlon = convert_to_latlon(row['last_coord'][0], row['last_coord'][1])
-
-        # Convert the RGB color to a hex string for folium
-        color_rgb = eval(row['color'])  # Convert the string '[1.0, 1.0, 0.0]' to a list [1.0, 1.0, 0.0]
-        color_hex = f'#{int(color_rgb[0]*255):02x}{int(color_rgb[1]*255):02x}{int(color_rgb[2]*255):02x}'
-
-        # Draw a line between the coordinates (lat/lon) with the specified color
-        folium.PolyLine([first_coord_latlon, last_coord_latlon], color=color_hex, weight=2.5, opacity=1).add_to(m)
+    # Draw a line between the first and last coordinates (lat/lon) of every row, as a single layer
+    lines = pd.DataFrame({
+        'latlon_coords': [[first, last] for first, last in zip(df['first_coord'], df['last_coord'])],
+        # Convert the RGB color string '[1.0, 1.0, 0.0]' to a hex string for folium
+        'color_hex': rgb_string_colors(df['color']),
+    })
+    add_line_layer(m, lines)
 
     # Save the map as an HTML string
     map_html = m._repr_html_()
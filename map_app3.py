@@ -1,48 +1,37 @@
 import streamlit as st
 import folium
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-from shapely import wkt
+from geometry import coords_column
+from regions import with_regions
+from render import add_line_layer, add_station_layer
 
 # Load station data with Pandas
-data = pd.read_csv("data/Randstad.csv")
+data = with_regions(pd.read_csv("data/Randstad.csv"))  # Adds missing region flags
 df = data
 
 # Load geospatial data (geometry in WKT format) using Pandas
 geodata = pd.read_csv("data/PlotDataHeleWeek.csv")
 
-# Convert 'geometry' column from WKT format to Shapely geometries
-geodata['geometry'] = geodata['geometry'].apply(wkt.loads)
+# Parse the 'geometry' column from WKT format in one pass; non-LineStrings become None
+geodata['coords'] = coords_column(geodata['geometry'])
 
 def create_map():
     # Start the map at a middle point (Amsterdam)
     m = folium.Map(location=[52.379189, 4.899431], zoom_start=10)
     
-    # Plot the stations from the df
-    for idx, row in df.iterrows():
-        lat, lon = row['Lat-coord'], row['Lng-coord']
-
-        # Determine color based on the Randstad value
-        color = "blue" if row['Randstad'] == 0.0 else "red"
-        
-        # Add a colored dot for each station based on Randstad value
-        folium.CircleMarker(
-            location=[lat, lon],
-            radius=7,  # Size of the dot
-            color=color,  # Set color based on Randstad value
-            fill=True,
-            fill_color=color,  # Fill color
-            fill_opacity=0.6  # Transparency of the dot fill
-        ).add_to(m)
+    # Plot the stations from the df as one layer, colored by their Randstad value
+    colors = np.where(df['Randstad'] == 0.0, "blue", "red")
+    add_station_layer(m, df, colors, radius=7, hit_radius=7, fill_opacity=0.6, popup=False, tooltip=False)
     
-    # Plot lines (connections) from the geodata
-    for _, row in geodata.iterrows():
-        if row.geometry.geom_type == 'LineString':  # Ensure it is a LineString
-            # Convert the LineString into a list of [lat, lon] pairs
-            line_coordinates = [[point[1], point[0]] for point in row.geometry.coords]  # Folium expects [lat, lon]
-            
-            # Add a PolyLine to the map for each connection
-            folium.PolyLine(locations=line_coordinates, color='green', weight=2.5).add_to(m)
+    # Plot lines (connections) from the geodata as a single layer; rows that are
+    # not a LineString have no coordinates and are skipped
+    lines = pd.DataFrame({
+        'latlon_coords': [None if c is None else c[:, ::-1] for c in geodata['coords']],  # [lat, lon] pairs
+        'color_hex': 'green',
+    })
+    add_line_layer(m, lines)
 
     return m
 
@@ -1,72 +1,64 @@
+import os
+import numpy as np
 import pandas as pd
-import re
-from pyproj import Transformer
 import folium
 import streamlit as st
+from colormap import rgb_string_colors
+from geometry import coords_column
+from line_store import read_line_data
+from projection import project_column
+from encoding import PRECISION as COORDINATE_PRECISION
+from regions import with_regions
+from render import add_line_layer, add_station_layer
 
-# Load the main CSV data
+LINE_FILE = "data/PlotDataHeleWeek.csv"
+
+# Load the station data
 @st.cache_data
 def load_data():
-    df = pd.read_csv("data/PlotDataHeleWeek.csv")
-    stations = pd.read_csv("data/Randstad.csv")
-    return df, stations
+    return with_regions(pd.read_csv("data/Randstad.csv"))  # Adds missing region flags
 
-# Extract coordinates function
-def extract_coords(geometry_str):
-    coords = re.findall(r'(-?\d+\.\d+)\s(-?\d+\.\d+)', geometry_str)
-    return [tuple(map(float, coord)) for coord in coords]
+# Load and process the line data; the cache is keyed on path and mtime, so
+# the frame (whose coordinates may be memory-mapped) is never hashed
+@st.cache_data
+def load_line_data(path, mtime):
+    return process_line_data(read_line_data(path))
 
 # Precompute data processing for lines
-@st.cache_data
 def process_line_data(df):
-    df['coords'] = df['geometry'].apply(extract_coords)
-    df['color_hex'] = df['color'].apply(lambda rgb: f'#{int(eval(rgb)[0]*255):02x}{int(eval(rgb)[1]*255):02x}{int(eval(rgb)[2]*255):02x}')
-    transformer = Transformer.from_crs("epsg:32631", "epsg:4326")
-    
-    def convert_coords_to_latlon(coords):
-        x_vals, y_vals = zip(*coords)
-        lat_vals, lon_vals = transformer.transform(x_vals, y_vals)
-        return list(zip(lat_vals, lon_vals))
-    
-    df['latlon_coords'] = df['coords'].apply(convert_coords_to_latlon)
+    if 'coords' not in df.columns:  # Stores already hold parsed coordinates
+        df['coords'] = coords_column(df['geometry'], keep_empty=True)
+    df['color_hex'] = rgb_string_colors(df['color'])
+    # Project all segments to lat/lon in a single transform call
+    df['latlon_coords'] = project_column(df['coords'])
     return df
 
-# Efficiently plot lines and stations
+# Efficiently plot lines and stations; mtime stands in for the unhashed frame
 @st.cache_data
-def draw_map(df, initial_center, initial_zoom):
+def draw_map(_df, mtime, initial_center, initial_zoom):
     # Use initial center and zoom level to keep map state
     m = folium.Map(location=initial_center, zoom_start=initial_zoom, control_scale=True, tiles='CartoDB positron')
     
-    # Add the polyline for the train lines
-    for _, row in df.iterrows():
-        latlon_coords = row['latlon_coords']
-        color_hex = row['color_hex']
-        folium.PolyLine(latlon_coords, color=color_hex, weight=2.5, opacity=1).add_to(m)
+    # Add the train lines as a single layer
+    add_line_layer(m, _df)
     
     return m
 
-# Add station markers based on selection
+# Add station markers based on selection, as one layer
 def add_stations_to_map(m, stations, selected_types):
-    for _, row in stations.iterrows():
-        if row['Randstad'] in selected_types:
-            color = 'blue' if row['Randstad'] == 0.0 else 'red'
-            folium.CircleMarker(
-                location=[row['Lat-coord'], row['Lng-coord']],
-                radius=1,  
-                color=color,
-                fill=True,
-                fill_opacity=1,
-                popup=row['Station']
-            ).add_to(m)
-    return m
+    selected = stations[stations['Randstad'].isin(selected_types)]
+    colors = np.where(selected['Randstad'] == 0.0, 'blue', 'red')
+    return add_station_layer(m, selected, colors, tooltip=False, hit_radius=1,
+                             precision=COORDINATE_PRECISION)
 
 # Main function for Streamlit
 def main():
     st.title("Streamlit Map with Selectable Station Types")
 
     # Load and process data
-    df, stations = load_data()
-    df = process_line_data(df)
+    stations = load_data()
+    mtime = os.path.getmtime(LINE_FILE)
+    df = load_line_data(LINE_FILE, mtime)
 
     # Get the initial map center and zoom level from the first coordinates
     initial_center = df['latlon_coords'][0][0]  # First coordinate
@@ -81,7 +73,7 @@ def main():
     )
 
     # Draw the Folium map for the lines
-    folium_map = draw_map(df, initial_center, initial_zoom)
+    folium_map = draw_map(df, mtime, initial_center, initial_zoom)
 
     # Add selected station types to the map (if any)
     if station_type:
@@ -1,39 +1,49 @@
+import os
+import numpy as np
 import pandas as pd
-import re
-from pyproj import Transformer
 import folium
 import streamlit as st
+from colormap import rgb_string_colors
+from geometry import coords_column
+from line_store import read_line_data
+from projection import project_column
+from encoding import PRECISION as COORDINATE_PRECISION
+from regions import with_regions
+from render import add_line_layer, add_station_layer
+from deck_render import hex_rgb, line_layer, rail_deck, station_layer
+from station_index import StationIndex
+
+# Draw the map with folium/Leaflet ("folium") or pydeck/deck.gl ("deck")
+MAP_RENDERER = "folium"
+
+# Load and process one line set; the cache is keyed on path and mtime, so
+# the frame (whose coordinates may be memory-mapped) is never hashed
+@st.cache_data
+def load_line_data(path, mtime):
+    return process_line_data(read_line_data(path))
 
-# Load the CSV data for multiple line sets
 @st.cache_data
+def load_stations():
+    return with_regions(pd.read_csv("data/Randstad-0.csv"))  # Adds missing region flags
+
+# Load the processed line sets and the stations
 def load_data():
-    # Load multiple datasets
-    df_hele_week = pd.read_csv("data/PlotDataHeleWeek.csv")
-    df_monday = pd.read_csv("data/PlotDataMonday.csv")  
-    df_wednesday = pd.read_csv("data/PlotDataWednesday.csv")
-    df_thursday = pd.read_csv("data/PlotDataThursday.csv")
-    df_friday = pd.read_csv("data/PlotDataFriday.csv")
-    stations = pd.read_csv("data/Randstad-0.csv")
-    return df_hele_week, df_monday, df_wednesday, df_thursday, df_friday, stations
-
-# Extract coordinates function
-def extract_coords(geometry_str):
-    coords = re.findall(r'(-?\d+\.\d+)\s(-?\d+\.\d+)', geometry_str)
-    return [tuple(map(float, coord)) for coord in coords]
+    paths = ["data/PlotDataHeleWeek.csv", "data/PlotDataMonday.csv", "data/PlotDataWednesday.csv",
+             "data/PlotDataThursday.csv", "data/PlotDataFriday.csv"]
+    return (*[load_line_data(path, os.path.getmtime(path)) for path in paths], load_stations())
+
+# Stations indexed by (Randstad, Type code), built once
+@st.cache_resource
+def get_station_index():
+    return StationIndex(load_stations())
 
 # Precompute data processing for lines
-@st.cache_data
 def process_line_data(df):
-    df['coords'] = df['geometry'].apply(extract_coords)
-    df['color_hex'] = df['color'].apply(lambda rgb: f'#{int(eval(rgb)[0]*255):02x}{int(eval(rgb)[1]*255):02x}{int(eval(rgb)[2]*255):02x}')
-    transformer = Transformer.from_crs("epsg:32631", "epsg:4326")
-    
-    def convert_coords_to_latlon(coords):
-        x_vals, y_vals = zip(*coords)
-        lat_vals, lon_vals = transformer.transform(x_vals, y_vals)
-        return list(zip(lat_vals, lon_vals))
-    
-    df['latlon_coords'] = df['coords'].apply(convert_coords_to_latlon)
+    if 'coords' not in df.columns:  # Stores already hold parsed coordinates
+        df['coords'] = coords_column(df['geometry'], keep_empty=True)
+    df['color_hex'] = rgb_string_colors(df['color'])
+    # Project all segments to lat/lon in a single transform call
+    df['latlon_coords'] = project_column(df['coords'])
     return df
 
 # Efficiently plot lines and stations
@@ -43,62 +53,29 @@ def draw_map(initial_center, initial_zoom):
     m = folium.Map(location=initial_center, zoom_start=initial_zoom, control_scale=True, tiles='CartoDB positron')
     return m
 
-# Add lines to the map
+# Add lines to the map as a single layer
 def add_lines_to_map(m, df):
-    for _, row in df.iterrows():
-        latlon_coords = row['latlon_coords']
-        color_hex = row['color_hex']
-        folium.PolyLine(latlon_coords, color=color_hex, weight=2.5, opacity=1).add_to(m)
-    return m
-
-# Add station markers based on selection
-def add_stations_to_map(m, stations, selected_types, selected_type_codes):
-    for _, row in stations.iterrows():
-        # Logic to filter stations based on selected types and type codes
-        if selected_types and selected_type_codes:  # Both selected
-            if row['Randstad'] in selected_types and row['Type code'] in selected_type_codes:
-                add_station_marker(m, row)
-        elif selected_types:  # Only station types selected
-            if row['Randstad'] in selected_types:
-                add_station_marker(m, row)
-        elif selected_type_codes:  # Only type codes selected
-            if row['Type code'] in selected_type_codes:
-                # Show Randstad intercity stations if type code is 1
-                if row['Type code'] == 1 and row['Randstad'] == 1.0:
-                    add_station_marker(m, row)
-        # If Randstad is selected but no type code selected
-        elif selected_types == [1.0]:  # If Randstad is selected and no types are selected
-            if row['Randstad'] == 1.0:
-                add_station_marker(m, row)
-
-    return m
-
-def add_station_marker(m, row):
-    # Determine the color based on Randstad type
-    color = '#bbbfb5' if row['Randstad'] == 0.0 else '#868a81'
-    
-    # Add a visible small marker
-    folium.CircleMarker(
-        location=[row['Lat-coord'], row['Lng-coord']],
-        radius=1,  # Keep the bullet size small
-        color=color,
-        fill=True,
-        fill_opacity=1,
-        popup=row['Station'],  # Show station name on click
-        tooltip=row['Station']  # Show station name on hover
-    ).add_to(m)
-    
-    # Add an invisible, larger clickable area to make selection easier
-    folium.CircleMarker(
-        location=[row['Lat-coord'], row['Lng-coord']],
-        radius=8,  # Larger radius for easier selection
-        color=color,
-        fill=True,
-        fill_opacity=0,  # Make the clickable area invisible
-        popup=row['Station'],
-        weight=row['Type code']  # No border for a seamless look
-    ).add_to(m)
-
+    return add_line_layer(m, df)
+
+# Stations matching the selection
+def select_stations(station_index, selected_types, selected_type_codes):
+    if selected_types and selected_type_codes:  # Both selected
+        return station_index.select(selected_types, selected_type_codes)
+    if selected_types:  # Only station types selected
+        return station_index.select(selected_types)
+    if selected_type_codes:  # Only type codes selected
+        # Show Randstad intercity stations if type code is 1
+        return station_index.select([1.0], [code for code in selected_type_codes if code == 1])
+    return station_index.stations.iloc[:0]  # Nothing selected
+
+# Marker color per station, based on Randstad type
+def station_colors(stations):
+    return np.where(stations['Randstad'] == 0.0, '#bbbfb5', '#868a81')
+
+# Add station markers based on selection, as one layer
+def add_stations_to_map(m, station_index, selected_types, selected_type_codes):
+    selected = select_stations(station_index, selected_types, selected_type_codes)
+    return add_station_layer(m, selected, station_colors(selected), precision=COORDINATE_PRECISION)
 
 # Main function for Streamlit
 def main():
@@ -109,13 +86,6 @@ def main():
     # Load and process data
     df_hele_week, df_monday, df_wednesday, df_thursday, df_friday, stations = load_data()
 
-    # Process each DataFrame
-    df_hele_week = process_line_data(df_hele_week)
-    df_monday = process_line_data(df_monday)
-    df_wednesday = process_line_data(df_wednesday)
-    df_thursday = process_line_data(df_thursday)
-    df_friday = process_line_data(df_friday)
-
     # Get the initial map center and zoom level from the first coordinates
     initial_center = df_hele_week['latlon_coords'][0][0]  # First coordinate
     initial_zoom = 7
@@ -144,26 +114,35 @@ def main():
         default=[]  # Default can be adjusted as needed
     )
 
-    # Draw the initial map
-    folium_map = draw_map(initial_center, initial_zoom)
-
-    # Add selected line sets to the map
-    if 'PlotDataHeleWeek' in line_sets:
-        folium_map = add_lines_to_map(folium_map, df_hele_week)
-    if 'Monday' in line_sets:
-        folium_map = add_lines_to_map(folium_map, df_monday)
-    if 'Wednesday' in line_sets:
-        folium_map = add_lines_to_map(folium_map, df_wednesday)
-    if 'Thursday' in line_sets:
-        folium_map = add_lines_to_map(folium_map, df_thursday)
-    if 'Friday' in line_sets:
-        folium_map = add_lines_to_map(folium_map, df_friday)
-
-    # Add selected station types to the map (if any)
-    folium_map = add_stations_to_map(folium_map, stations, station_type, selected_type_codes)
-
-    # Display the map in Streamlit
-    st.components.v1.html(folium_map._repr_html_(), height=600)
+    if MAP_RENDERER == "deck":
+        # Overlaid line sets are drawn on the GPU, one path layer each
+        frames = {'PlotDataHeleWeek': df_hele_week, 'Monday': df_monday, 'Wednesday': df_wednesday,
+                  'Thursday': df_thursday, 'Friday': df_friday}
+        selected = select_stations(get_station_index(), station_type, selected_type_codes)
+        layers = [line_layer(frames[name], layer_id=name) for name in line_sets]
+        layers.append(station_layer(selected, hex_rgb(station_colors(selected)), layer_id='stations'))
+        st.pydeck_chart(rail_deck(layers, initial_center, initial_zoom), height=600)
+    else:
+        # Draw the initial map
+        folium_map = draw_map(initial_center, initial_zoom)
+
+        # Add selected line sets to the map
+        if 'PlotDataHeleWeek' in line_sets:
+            folium_map = add_lines_to_map(folium_map, df_hele_week)
+        if 'Monday' in line_sets:
+            folium_map = add_lines_to_map(folium_map, df_monday)
+        if 'Wednesday' in line_sets:
+            folium_map = add_lines_to_map(folium_map, df_wednesday)
+        if 'Thursday' in line_sets:
+            folium_map = add_lines_to_map(folium_map, df_thursday)
+        if 'Friday' in line_sets:
+            folium_map = add_lines_to_map(folium_map, df_friday)
+
+        # Add selected station types to the map (if any)
+        folium_map = add_stations_to_map(folium_map, get_station_index(), station_type, selected_type_codes)
+
+        # Display the map in Streamlit
+        st.components.v1.html(folium_map._repr_html_(), height=600)
 
     # Create a legend on the right side of the map
     legend_html = """
@@ -0,0 +1,175 @@
+"""Unified rail network model over the per-day PlotData files.
+
+The day files describe largely the same (From, To) track segments with the
+same LINESTRINGs and differ mainly in Seats. ``RailNetwork`` keeps every
+unique segment geometry once, parsed and projected, next to a dense seats
+matrix with one column per day. Week totals and other aggregates come from
+that matrix, and switching days is a column lookup.
+"""
+import copy
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+import pandas as pd
+
+from colormap import capacity_colors
+from geometry import coords_column
+from line_store import read_line_data
+from projection import project_column, project_coords
+from simplify import LOD_TOLERANCES, simplify_mask, tolerance_for_zoom
+from station_codes import CodeDictionary
+
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+WEEK = "Week"
+KEY = ["From", "To"]
+
+
+@dataclass
+class RailNetwork:
+    # One row per unique (From, To) segment, indexed by segment id
+    segments: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(
+        {"From": pd.Series(dtype=str), "To": pd.Series(dtype=str)}))
+    # UTM and lat/lon coordinates of all segments; segment i spans
+    # coords[offsets[i]:offsets[i + 1]]
+    coords: np.ndarray = field(default_factory=lambda: np.empty((0, 2)))
+    latlon: np.ndarray = field(default_factory=lambda: np.empty((0, 2)))
+    offsets: np.ndarray = field(default_factory=lambda: np.zeros(1, dtype=np.int64))
+    # segments x days; NaN where a day has no service on a segment
+    seats: pd.DataFrame = field(default_factory=pd.DataFrame)
+    # Simplification keep-masks over coords, per tolerance in metres
+    levels: dict = field(default_factory=dict, repr=False)
+    # Station-code dictionary and the (From, To) ids of every segment in it
+    codes: CodeDictionary = field(default_factory=CodeDictionary, repr=False)
+    code_ids: np.ndarray = field(default_factory=lambda: np.empty((0, 2), dtype=np.int32), repr=False)
+
+    def __len__(self):
+        return len(self.segments)
+
+    @property
+    def days(self):
+        return list(self.seats.columns)
+
+    # Add one day's PlotData frame: new geometries are parsed and projected,
+    # known ones are only looked up, and the day's Seats become a new column.
+    # Frames from process_day_file already carry coords and latlon_coords.
+    def add_day(self, day, df):
+        df = df.drop_duplicates(subset=KEY)
+        if 'coords' not in df.columns:
+            df = df.assign(coords=coords_column(df['geometry']))
+        df = df[df['coords'].map(lambda c: c is not None and len(c) > 0).to_numpy()]
+
+        known = pd.MultiIndex.from_frame(self.segments[KEY])
+        keys = pd.MultiIndex.from_frame(df[KEY].astype(str))
+        is_new = ~keys.isin(known)
+        if is_new.any():
+            self._append_segments(df[is_new])
+
+        ids = pd.MultiIndex.from_frame(self.segments[KEY]).get_indexer(keys)
+        column = np.full(len(self.segments), np.nan)
+        column[ids] = df['Seats'].to_numpy(dtype=np.float64)
+        self.seats = self.seats.reindex(self.segments.index)
+        self.seats[day] = column
+        return self
+
+    def _append_segments(self, df):
+        added = np.concatenate(df['coords'].tolist())
+        if 'latlon_coords' in df.columns:
+            latlon = np.concatenate(df['latlon_coords'].tolist())
+        else:
+            latlon = project_coords(added)
+        lengths = df['coords'].map(len).to_numpy(dtype=np.int64)
+        self.coords = np.concatenate([self.coords, added])
+        self.latlon = np.concatenate([self.latlon, latlon])
+        self.offsets = np.concatenate([self.offsets, self.offsets[-1] + np.cumsum(lengths)])
+        self.segments = pd.concat([self.segments, df[KEY].astype(str)], ignore_index=True)
+        ids = np.column_stack([self.codes.ids(df[column], add=True) for column in KEY])
+        self.code_ids = np.concatenate([self.code_ids, ids])
+        # Extend the precomputed levels with masks for the new segments only
+        local_offsets = np.concatenate([[0], np.cumsum(lengths)])
+        self.levels = {tolerance: np.concatenate([keep, simplify_mask(added, local_offsets, tolerance)])
+                       for tolerance, keep in self.levels.items()}
+
+    # Copy that later add_day and level calls leave unchanged. The arrays and
+    # frames they extend are replaced rather than written to, so only the
+    # seats matrix, the level dict and the code dictionary are copied.
+    def snapshot(self):
+        return replace(self, seats=self.seats.copy(), levels=dict(self.levels), codes=copy.copy(self.codes))
+
+    # Keep-mask for one level of detail, computed on the UTM coordinates
+    def level(self, tolerance):
+        if tolerance not in self.levels:
+            self.levels[tolerance] = simplify_mask(self.coords, self.offsets, tolerance)
+        return self.levels[tolerance]
+
+    # Precompute every level of detail in LOD_TOLERANCES
+    def build_levels(self, tolerances=LOD_TOLERANCES):
+        for tolerance in tolerances:
+            self.level(tolerance)
+        return self
+
+    # Lat/lon coordinates of segment i, as a view into the shared buffer,
+    # or simplified to the given keep-mask
+    def segment_latlon(self, i, keep=None):
+        latlon = self.latlon[self.offsets[i]:self.offsets[i + 1]]
+        if keep is None:
+            return latlon
+        return latlon[keep[self.offsets[i]:self.offsets[i + 1]]]
+
+    # Seats per segment for one day, or the week total for WEEK
+    def day_seats(self, day):
+        if day == WEEK:
+            return self.week_totals()
+        return self.seats[day]
+
+    def week_totals(self):
+        return self.aggregate("sum")
+
+    # Any row-wise aggregate over the day columns ("sum", "mean", "max", ...)
+    def aggregate(self, how, days=None):
+        seats = self.seats[list(days)] if days is not None else self.seats
+        if how == "sum":
+            return seats.sum(axis=1, min_count=1)
+        return seats.agg(how, axis=1)
+
+    # Processed line data for one day, in the shape process_line_data returns:
+    # From, To, Seats, latlon_coords and the min-max normalized capacity_norm.
+    # With a zoom level, latlon_coords holds the level of detail fitting it;
+    # with classes, colors are quantized into that many capacity classes.
+    def line_data(self, day, zoom=None, classes=None):
+        seats = self.day_seats(day)
+        served = seats.notna().to_numpy()
+        tolerance = tolerance_for_zoom(zoom) if zoom is not None else None
+        keep = self.level(tolerance) if tolerance is not None else None
+        df = self.segments[served].copy()
+        df['Seats'] = seats[served]
+        df['latlon_coords'] = [self.segment_latlon(i, keep) for i in np.flatnonzero(served)]
+        df['capacity_norm'] = normalize_capacity(df['Seats'])
+        df['color_hex'] = capacity_colors(df['capacity_norm'], classes)
+        return df
+
+
+# Min-max normalize seat capacity to [0, 1] for color scaling
+def normalize_capacity(seats):
+    return (seats - seats.min()) / (seats.max() - seats.min())
+
+
+# Fully processed frame for one PlotData file: parsed and projected segment
+# coordinates, normalized capacity and colors. This is what warm_cache keeps
+# on disk between processes.
+def process_day_file(path):
+    df = read_line_data(path)
+    if 'coords' not in df.columns:
+        df['coords'] = coords_column(df['geometry'])
+    df = df.dropna(subset=['coords'])[KEY + ['Seats', 'coords']].reset_index(drop=True)
+    df['latlon_coords'] = project_column(df['coords'])
+    df['capacity_norm'] = normalize_capacity(df['Seats'])
+    df['color_hex'] = capacity_colors(df['capacity_norm'])
+    return df
+
+
+# Build a network from a {day: PlotData csv path} mapping
+def load_network(paths):
+    network = RailNetwork()
+    for day, path in paths.items():
+        network.add_day(day, read_line_data(path))
+    return network.build_levels()
@@ -0,0 +1,399 @@
+"""Streaming ingest of operator occupancy feeds into PlotData files.
+
+The operator feeds (data/Arriva.csv, data/Qbuzz.csv) hold one row per
+journey per timing link: UserStopCodeBegin, UserStopCodeEnd, VehicleType,
+TotalNumberOfCoaches and OperatingDay. ``aggregate_feeds`` reads them in
+chunks with categorical dtypes, turns every row into seats through a
+vehicle-type capacity table, and keeps only the running seat totals per
+(OperatingDay, From, To). Memory is bounded by the number of distinct
+segments per day, not by the size of the feeds.
+
+A timing link runs between timing points, which need not be adjacent
+stations. ``SegmentGraph`` routes every distinct link once over the
+station-to-station segments of reference PlotData files (shortest path by
+track length), and the link's seats count on every segment along the way.
+Segments are undirected, as in PlotData: both directions add up on the
+orientation the reference files use.
+
+``plotdata_frames`` turns the routed totals into the PlotData format the map
+apps read (From, To, Seats, geometry, color), one frame per operating day
+or per weekday.
+
+With --state, feeds are folded into a ``PartialStore`` instead: routed
+totals persist per (operator, OperatingDay), a feed only replaces the days
+it contains (so a re-sent day is a correction), and only the weekday files
+it touches are rewritten, along with the whole-week file. A nightly run
+costs in proportion to the new feed, not to the history.
+
+    $ python occupancy.py data/Arriva.csv data/Qbuzz.csv
+    $ python occupancy.py new/Arriva-2024-10-14.csv --state OutputData/Feeds/state --out-dir OutputData
+"""
+import argparse
+import glob
+import heapq
+import os
+import tempfile
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from colormap import capacity_rgb, rgb_strings
+from geometry import parse_linestrings
+from line_store import read_plotdata_csv
+from network import DAYS
+from station_codes import upper_categorical
+
+# Approximate seats per coach and the coach count assumed when a row has
+# none, per vehicle type. Override with --capacity (a CSV with these columns).
+CAPACITY = pd.DataFrame.from_records([
+    ("GTW", 55, 3),
+    ("Flirt", 55, 3),
+    ("Lint", 60, 2),
+    ("WINK", 75, 2),
+    ("SNG", 57, 3),
+    ("SLT", 48, 4),
+    ("VIRM", 95, 6),
+    ("ICM", 75, 4),
+    ("ICNG", 50, 8),
+    ("DDZ", 90, 6),
+], columns=["VehicleType", "seats_per_coach", "coaches"]).set_index("VehicleType")
+
+FEED_DTYPES = {
+    "DataOwnerCode": "category",
+    "OperatingDay": "category",
+    "UserStopCodeBegin": "category",
+    "UserStopCodeEnd": "category",
+    "VehicleType": "category",
+    "TotalNumberOfCoaches": "float32",
+}
+KEY = ["OperatingDay", "From", "To"]
+OPERATOR_KEY = ["DataOwnerCode", *KEY]
+CHUNK_ROWS = 500_000
+COMPACT_EVERY = 16  # Chunks between merges of the partial totals
+WEEK_FILE = "HeleWeek"  # Whole-week PlotData file name, as in data/
+
+
+def load_capacity(path=None):
+    if path is None:
+        return CAPACITY
+    return pd.read_csv(path).set_index("VehicleType")[["seats_per_coach", "coaches"]]
+
+
+# Seats per key (by default OperatingDay, From, To) for one chunk of a feed.
+# Stop codes are upper-cased, as in PlotData. Rows of an unknown vehicle
+# type are left out.
+def chunk_seats(chunk, capacity=CAPACITY, key=KEY):
+    vehicle = chunk["VehicleType"].astype(str)
+    per_coach = vehicle.map(capacity["seats_per_coach"])
+    coaches = chunk["TotalNumberOfCoaches"].fillna(vehicle.map(capacity["coaches"]))
+    frame = pd.DataFrame({
+        "DataOwnerCode": chunk["DataOwnerCode"],
+        "OperatingDay": chunk["OperatingDay"],
+        "From": upper_categorical(chunk["UserStopCodeBegin"]),
+        "To": upper_categorical(chunk["UserStopCodeEnd"]),
+        "Seats": (per_coach * coaches).astype(np.float64),
+    })[per_coach.notna().to_numpy()]
+    return frame.groupby(key, observed=True)["Seats"].sum()
+
+
+def _merge(partials):
+    combined = pd.concat(partials)
+    return combined.groupby(level=list(range(combined.index.nlevels))).sum()
+
+
+class SeatsAggregator:
+    """Running seat totals per key (OperatingDay, From, To) over feed chunks."""
+
+    def __init__(self, capacity=CAPACITY, key=KEY):
+        self.capacity = capacity
+        self.key = list(key)
+        self.rows = 0
+        self.unknown_rows = 0
+        self._partials = []
+
+    def add(self, chunk):
+        self.rows += len(chunk)
+        self.unknown_rows += int((~chunk["VehicleType"].astype(str).isin(self.capacity.index)).sum())
+        seats = chunk_seats(chunk, self.capacity, self.key)
+        # Category codes differ per chunk, so totals are kept on plain labels
+        seats.index = pd.MultiIndex.from_arrays(
+            [seats.index.get_level_values(level).astype(str) for level in range(seats.index.nlevels)],
+            names=self.key)
+        self._partials.append(seats)
+        if len(self._partials) >= COMPACT_EVERY:
+            self._partials = [_merge(self._partials)]
+        return self
+
+    def result(self):
+        if not self._partials:
+            return pd.Series(dtype=np.float64, index=pd.MultiIndex.from_arrays([[]] * len(self.key), names=self.key))
+        self._partials = [_merge(self._partials)]
+        return self._partials[0]
+
+
+# Stream the feed CSVs chunk by chunk into seat totals per key
+def aggregate_feeds(paths, capacity=CAPACITY, chunksize=CHUNK_ROWS, key=KEY):
+    aggregator = SeatsAggregator(capacity, key)
+    for path in paths:
+        for chunk in pd.read_csv(path, usecols=list(FEED_DTYPES), dtype=FEED_DTYPES, chunksize=chunksize):
+            aggregator.add(chunk)
+    return aggregator
+
+
+class SegmentGraph:
+    """Undirected graph of the PlotData segments, weighted by track length."""
+
+    def __init__(self, pairs, geometry, lengths):
+        self.pairs = list(pairs)  # (From, To) per segment, in reference orientation
+        self.geometry = list(geometry)
+        self.ids = {pair: i for i, pair in enumerate(self.pairs)}
+        self.neighbours = {}
+        for i, ((start, end), length) in enumerate(zip(self.pairs, lengths)):
+            self.neighbours.setdefault(start, []).append((end, float(length), i))
+            self.neighbours.setdefault(end, []).append((start, float(length), i))
+        self._tree = lru_cache(maxsize=None)(self._shortest_tree)
+
+    # Unique segments of reference PlotData files, with their lengths in metres
+    @classmethod
+    def from_plotdata(cls, paths):
+        frames = [read_plotdata_csv(path) for path in paths]
+        df = pd.concat(frames, ignore_index=True).drop_duplicates(subset=["From", "To"])
+        coords, offsets, valid = parse_linestrings(df["geometry"])
+        df = df[valid]
+        # Sum the steps between consecutive points of the same segment
+        point_segment = np.repeat(np.arange(len(df)), np.diff(offsets))
+        within = point_segment[1:] == point_segment[:-1]
+        steps = np.hypot(*np.diff(coords, axis=0).T)
+        lengths = np.bincount(point_segment[1:][within], steps[within], minlength=len(df))
+        return cls(zip(df["From"], df["To"]), df["geometry"], lengths)
+
+    # Dijkstra from start: {station: (segment id, previous station)}
+    def _shortest_tree(self, start):
+        distance = {start: 0.0}
+        previous = {}
+        queue = [(0.0, start)]
+        while queue:
+            d, station = heapq.heappop(queue)
+            if d > distance[station]:
+                continue
+            for neighbour, length, segment in self.neighbours.get(station, ()):
+                if d + length < distance.get(neighbour, np.inf):
+                    distance[neighbour] = d + length
+                    previous[neighbour] = (segment, station)
+                    heapq.heappush(queue, (d + length, neighbour))
+        return previous
+
+    # Segment ids on the shortest path from start to end, or None without one
+    def path(self, start, end):
+        if start == end or start not in self.neighbours:
+            return None
+        previous = self._tree(start)
+        if end not in previous:
+            return None
+        segments = []
+        while end != start:
+            segment, end = previous[end]
+            segments.append(segment)
+        return segments[::-1]
+
+
+# Totals per key (any index ending in From, To) on the graph's segments:
+# every link's seats count on each segment of its path. Links without a
+# path are kept as they are, turned to sorted order; unrouted holds those links.
+def route(seats, graph):
+    frame = seats.reset_index()
+    links = frame[["From", "To"]].drop_duplicates()
+    paths = {(start, end): graph.path(start, end) for start, end in zip(links["From"], links["To"])}
+    unrouted = [link for link, path in paths.items() if path is None]
+
+    link = pd.MultiIndex.from_frame(frame[["From", "To"]])
+    steps = pd.Series([paths[key] if paths[key] is not None else [None] for key in link], index=frame.index)
+    frame = frame.assign(segment=steps).explode("segment")
+    routed = frame["segment"].notna().to_numpy()
+    ids = frame.loc[routed, "segment"].astype(int).to_numpy()
+    frame.loc[routed, "From"] = [graph.pairs[i][0] for i in ids]
+    frame.loc[routed, "To"] = [graph.pairs[i][1] for i in ids]
+    flip = ~routed & (frame["From"] > frame["To"]).to_numpy()
+    frame.loc[flip, ["From", "To"]] = frame.loc[flip, ["To", "From"]].to_numpy()
+    return frame.groupby(list(seats.index.names), sort=False)["Seats"].sum(), unrouted
+
+
+# PlotData frame (From, To, Seats, geometry, color) for one day's totals
+def plotdata_frame(day_seats, graph):
+    df = day_seats.reset_index()[["From", "To", "Seats"]]
+    df["geometry"] = [graph.geometry[graph.ids[pair]] if pair in graph.ids else None
+                      for pair in zip(df["From"], df["To"])]
+    seats = df["Seats"]
+    df["color"] = rgb_strings(capacity_rgb((seats - seats.min()) / (seats.max() - seats.min())))
+    return df
+
+
+# {label: PlotData frame} from routed totals, labelled by operating date
+# or, with by="weekday", by weekday name with seats averaged over the dates
+def plotdata_frames(seats, graph, by="date"):
+    if by == "weekday":
+        dates = seats.index.get_level_values("OperatingDay")
+        weekday = pd.to_datetime(dates).day_name()
+        counts = pd.Series(dates).groupby(weekday).nunique()
+        seats = seats.groupby([weekday, seats.index.get_level_values("From"),
+                               seats.index.get_level_values("To")]).sum().rename_axis(KEY)
+        seats = seats / counts.reindex(seats.index.get_level_values(0)).to_numpy()
+    return {label: plotdata_frame(group.droplevel(0), graph) for label, group in seats.groupby(level=0)}
+
+
+# Write a CSV to a temporary file and swap it in, so readers never see half a file
+def _write_csv(path, df):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            df.to_csv(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class PartialStore:
+    """Routed seat totals persisted per (operator, OperatingDay), plus their
+    running sums per weekday.
+
+    partials/<operator>/<OperatingDay>.csv holds one operator's seats per
+    segment for one day and weekdays/<Weekday>.csv the sum of all partials
+    of that weekday. Replacing a day's partial adds the difference to its
+    weekday sum, so an update reads and writes only the affected days and
+    weekdays, however much history the store holds.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _partial_path(self, operator, day):
+        return os.path.join(self.root, "partials", operator, f"{day}.csv")
+
+    def _sum_path(self, weekday):
+        return os.path.join(self.root, "weekdays", f"{weekday}.csv")
+
+    @staticmethod
+    def _read(path):
+        if not os.path.exists(path):
+            return pd.Series(dtype=np.float64, name="Seats",
+                             index=pd.MultiIndex.from_arrays([[], []], names=["From", "To"]))
+        return pd.read_csv(path, keep_default_na=False, dtype={"From": str, "To": str}).set_index(["From", "To"])["Seats"]
+
+    # Operating days with at least one partial
+    def dates(self):
+        paths = glob.glob(os.path.join(self.root, "partials", "*", "*.csv"))
+        return sorted({os.path.splitext(os.path.basename(path))[0] for path in paths})
+
+    def partial(self, operator, day):
+        return self._read(self._partial_path(operator, day))
+
+    # Store seats (indexed by From, To) as the operator's partial for day,
+    # replacing any earlier one; returns the change per segment
+    def replace(self, operator, day, seats):
+        old = self.partial(operator, day)
+        _write_csv(self._partial_path(operator, day), seats.rename("Seats"))
+        return seats.sub(old, fill_value=0)
+
+    def weekday_sum(self, weekday):
+        return self._read(self._sum_path(weekday))
+
+    # Add a change per segment to a weekday's sum; segments that drop to
+    # zero are removed
+    def add_to_weekday(self, weekday, delta):
+        total = self.weekday_sum(weekday).add(delta, fill_value=0)
+        _write_csv(self._sum_path(weekday), total[total.abs() > 1e-9].sort_index().rename("Seats"))
+
+    # Average seats per segment over the operating days of a weekday
+    def weekday_seats(self, weekday):
+        days = sum(pd.Timestamp(day).day_name() == weekday for day in self.dates())
+        return self.weekday_sum(weekday) / max(days, 1)
+
+    # Recompute every weekday sum from all partials, e.g. after an
+    # interrupted update or a hand-edited partial
+    def rebuild(self):
+        totals = {}
+        for path in glob.glob(os.path.join(self.root, "partials", "*", "*.csv")):
+            weekday = pd.Timestamp(os.path.splitext(os.path.basename(path))[0]).day_name()
+            seats = self._read(path)
+            totals[weekday] = seats if weekday not in totals else totals[weekday].add(seats, fill_value=0)
+        for path in glob.glob(os.path.join(self.root, "weekdays", "*.csv")):
+            os.unlink(path)
+        for weekday, total in totals.items():
+            self.add_to_weekday(weekday, total)
+        return sorted(totals, key=DAYS.index)
+
+
+# Fold new feed files into the store: every (operator, OperatingDay) they
+# contain replaces that day's partial, so a re-sent day is a correction.
+# Returns the weekdays that changed, the unrouted links and the aggregator.
+def ingest(paths, store, graph, capacity=CAPACITY, chunksize=CHUNK_ROWS):
+    aggregator = aggregate_feeds(paths, capacity, chunksize, key=OPERATOR_KEY)
+    seats, unrouted = route(aggregator.result(), graph)
+    deltas = {}
+    for (operator, day), group in seats.groupby(level=["DataOwnerCode", "OperatingDay"], sort=False):
+        delta = store.replace(operator, day, group.droplevel([0, 1]).sort_index())
+        weekday = pd.Timestamp(day).day_name()
+        deltas[weekday] = delta if weekday not in deltas else deltas[weekday].add(delta, fill_value=0)
+    for weekday, delta in deltas.items():
+        store.add_to_weekday(weekday, delta)
+    return sorted(deltas, key=DAYS.index), unrouted, aggregator
+
+
+# PlotData<Weekday>.csv for the given weekdays and PlotData<WEEK_FILE>.csv,
+# the sum of the weekday averages, from the store's weekday sums
+def write_weekly(store, graph, out_dir, weekdays=DAYS):
+    paths = []
+    for weekday in weekdays:
+        paths.append(os.path.join(out_dir, f"PlotData{weekday}.csv"))
+        _write_csv(paths[-1], plotdata_frame(store.weekday_seats(weekday), graph))
+    week = pd.concat([store.weekday_seats(weekday) for weekday in DAYS])
+    week = week.groupby(level=["From", "To"]).sum().rename("Seats")
+    paths.append(os.path.join(out_dir, f"PlotData{WEEK_FILE}.csv"))
+    _write_csv(paths[-1], plotdata_frame(week, graph))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate operator occupancy feeds into PlotData files.")
+    parser.add_argument("feeds", nargs="+", help="Feed CSVs (e.g. data/Arriva.csv data/Qbuzz.csv)")
+    parser.add_argument("--reference", nargs="+",
+                        help="PlotData files providing the segments (default: data/PlotData*.csv)")
+    parser.add_argument("--capacity", help="CSV with VehicleType, seats_per_coach, coaches")
+    parser.add_argument("--by", choices=["date", "weekday"], default="date")
+    parser.add_argument("--out-dir", default="OutputData/Feeds")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--state", help="Directory of persisted partials; fold the feeds in incrementally "
+                                        "and write the weekday and whole-week files (--by is ignored)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="With --state, recompute the weekday sums from all partials first")
+    args = parser.parse_args()
+
+    graph = SegmentGraph.from_plotdata(args.reference or sorted(glob.glob("data/PlotData*.csv")))
+    if args.state:
+        store = PartialStore(args.state)
+        rebuilt = store.rebuild() if args.rebuild else []
+        weekdays, unrouted, aggregator = ingest(args.feeds, store, graph, load_capacity(args.capacity),
+                                                args.chunksize)
+        weekdays = sorted(set(weekdays) | set(rebuilt), key=DAYS.index)
+        for path in write_weekly(store, graph, args.out_dir, weekdays):
+            print(f"{path}: rewritten")
+    else:
+        aggregator = aggregate_feeds(args.feeds, load_capacity(args.capacity), args.chunksize)
+        seats, unrouted = route(aggregator.result(), graph)
+        os.makedirs(args.out_dir, exist_ok=True)
+        for label, df in plotdata_frames(seats, graph, args.by).items():
+            path = os.path.join(args.out_dir, f"PlotData{label}.csv")
+            df.to_csv(path)
+            print(f"{path}: {len(df)} segments, {df['geometry'].isna().sum()} without geometry")
+    if unrouted:
+        print(f"{len(unrouted)} links without a path over the reference segments: {unrouted}")
+    if aggregator.unknown_rows:
+        print(f"{aggregator.unknown_rows} of {aggregator.rows} rows had a vehicle type without capacity")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Per-rerun profiling spans and the in-app performance panel.
+
+A ``Profiler`` collects one record per stage of a rerun: its wall time, and
+whatever the stage adds (cache hit or miss, rows, vertices, output bytes):
+
+    with profiler.span("line_data", cached=True) as span:
+        df = registry.line_data(day)
+        span["rows"] = len(df)
+
+Code deeper down reaches the profiler of the running rerun through
+``current()`` (it is kept per thread, as Streamlit runs every session's
+script in its own thread), and a cached function reports that its body ran
+with ``current().miss()``; a cached span without a miss counts as a hit.
+
+Profiling is off unless ``MAP_PROFILE=1`` is set or the page is opened
+with ``?profile=1``. Off, a span is a shared no-op context manager, so the
+instrumented code pays one method call per stage. ``show_panel`` draws the
+recent reruns in the sidebar with a JSON lines download, and
+``MAP_PROFILE_LOG`` names a file every rerun's records are appended to, for
+the log pipeline.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+PROFILE_ENV = "MAP_PROFILE"
+LOG_ENV = "MAP_PROFILE_LOG"
+HISTORY = 20  # Reruns kept for the panel, per session
+
+_local = threading.local()
+
+
+class _Span:
+    __slots__ = ("profiler", "record", "start")
+
+    def __init__(self, profiler, record):
+        self.profiler = profiler
+        self.record = record
+
+    def __enter__(self):
+        self.profiler._open.append(self.record)
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, *exc):
+        self.record["ms"] = round((time.perf_counter() - self.start) * 1e3, 3)
+        self.profiler._open.remove(self.record)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+    scratch = {}  # Fields written while profiling is off land here and are never read
+
+    def __enter__(self):
+        return self.scratch
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Profiler:
+    """Spans of one rerun; a disabled profiler records nothing."""
+
+    def __init__(self, enabled=True, app=None):
+        self.enabled = enabled
+        self.app = app
+        self.run = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.records = []
+        self._open = []
+
+    # Context manager timing one stage; it yields the stage's record, to
+    # which the stage adds its own fields. A cached span reports "hit" unless
+    # miss() is called while it is open.
+    def span(self, name, cached=False, **fields):
+        if not self.enabled:
+            return NULL_SPAN
+        record = {"run": self.run, "app": self.app, "stage": name, "depth": len(self._open),
+                  "offset_ms": round((time.time() - self.started) * 1e3, 3), **fields}
+        if cached:
+            record["cache"] = "hit"
+        self.records.append(record)
+        return _Span(self, record)
+
+    # Mark the innermost open cached span as a miss
+    def miss(self):
+        for record in reversed(self._open):
+            if "cache" in record:
+                record["cache"] = "miss"
+                return
+
+    # Make this the profiler current() returns in this thread
+    def __enter__(self):
+        self._previous = getattr(_local, "profiler", None)
+        _local.profiler = self
+        return self
+
+    def __exit__(self, *exc):
+        _local.profiler = self._previous
+        if self.enabled and os.environ.get(LOG_ENV):
+            self.write(os.environ[LOG_ENV])
+        return False
+
+    def to_jsonl(self):
+        return "".join(json.dumps(record, default=str) + "\n" for record in self.records)
+
+    # Append the records to a JSON lines file
+    def write(self, path):
+        with open(path, "a") as f:
+            f.write(self.to_jsonl())
+
+
+DISABLED = Profiler(enabled=False)
+
+
+# Profiler of the rerun running in this thread; a disabled one outside a rerun
+def current():
+    return getattr(_local, "profiler", None) or DISABLED
+
+
+# Whether this rerun is profiled: MAP_PROFILE=1, or ?profile=1 in the URL
+def profiling_enabled():
+    if os.environ.get(PROFILE_ENV, "") not in ("", "0"):
+        return True
+    import streamlit as st
+    return st.query_params.get("profile") == "1"
+
+
+# Sidebar panel with this session's recent reruns, newest first, and their
+# records as a JSON lines download
+def show_panel(profiler):
+    if not profiler.enabled:
+        return
+    import pandas as pd
+    import streamlit as st
+
+    history = st.session_state.setdefault("_profile_history", [])
+    history.append(profiler)
+    del history[:-HISTORY]
+    with st.sidebar.expander("Performance"):
+        for run in reversed(history):
+            if not run.records:
+                continue
+            top = [record.get("ms", 0) for record in run.records if record["depth"] == 0]
+            st.markdown(f"**Rerun {run.run}**: {sum(top):,.1f} ms")
+            frame = pd.DataFrame(run.records).drop(columns=["run", "app", "offset_ms"], errors="ignore")
+            frame["stage"] = ["  " * depth + stage for depth, stage in zip(frame["depth"], frame["stage"])]
+            st.dataframe(frame.drop(columns="depth"), hide_index=True)
+        st.download_button("Download JSON lines", "".join(run.to_jsonl() for run in history),
+                           file_name="profile.jsonl", mime="application/jsonl")
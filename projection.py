@@ -0,0 +1,43 @@
+"""UTM zone 31N -> WGS84 projection for the PlotData coordinates.
+
+One ``Transformer`` is built per process and reused, and every projection
+runs as a single vectorized ``transform`` call over a whole coordinate
+buffer instead of once per segment.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from pyproj import Transformer
+
+SOURCE_CRS = "epsg:32631"  # UTM zone 31N, as written in the PlotData files
+TARGET_CRS = "epsg:4326"  # WGS84 lat/lon, as expected by folium
+
+
+# One cached transformer per (source, target) pair for the whole process
+@lru_cache(maxsize=None)
+def get_transformer(source=SOURCE_CRS, target=TARGET_CRS):
+    return Transformer.from_crs(source, target)
+
+
+# Project a (n_points, 2) x/y buffer to a (n_points, 2) lat/lon buffer
+def project_coords(coords, source=SOURCE_CRS, target=TARGET_CRS):
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    lat, lon = get_transformer(source, target).transform(coords[:, 0], coords[:, 1])
+    return np.column_stack([lat, lon])
+
+
+# Project a per-row coordinate column (as built by geometry.coords_column)
+# with one transform call over the concatenated buffer. Rows holding None
+# stay None; every other row becomes a (n, 2) lat/lon array.
+def project_column(coords, source=SOURCE_CRS, target=TARGET_CRS):
+    coords = pd.Series(coords)
+    present = coords.notna().to_numpy()
+    segments = coords[present].tolist()
+    column = [None] * len(coords)
+    if segments:
+        lengths = np.fromiter((len(segment) for segment in segments), dtype=np.int64, count=len(segments))
+        projected = project_coords(np.concatenate(segments), source, target)
+        for position, segment in zip(np.flatnonzero(present), np.split(projected, np.cumsum(lengths)[:-1])):
+            column[position] = segment
+    return pd.Series(column, index=coords.index, dtype=object)
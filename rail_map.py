@@ -0,0 +1,93 @@
+"""Persistent map component with incremental updates.
+
+``st.components.v1.html`` rebuilds and re-sends the whole folium document on
+every rerun, and reinitializes Leaflet in a new iframe, losing pan and zoom.
+``rail_map`` renders a custom component (``rail_map_frontend/index.html``)
+whose Leaflet map lives across reruns:
+
+* the base network (every segment of the network, as encoded polylines) is
+  sent only when the frontend does not hold the current base version yet;
+* every rerun sends the small parts: a color per segment for the selected
+  seats column, and the selected stations.
+
+The frontend reports back the base version it holds and its zoom level, so
+the base is re-sent at a finer level of detail once the user zooms in, and
+the last clicked point, for looking up what lies there.
+"""
+import hashlib
+import os
+
+import numpy as np
+import streamlit as st
+import streamlit.components.v1 as components
+
+from encoding import PRECISION, encode_polylines
+from simplify import tolerance_for_zoom
+
+_component = components.declare_component(
+    "rail_map", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "rail_map_frontend"))
+
+
+# Version of the base payload; changes whenever its geometry would
+def base_version(network, zoom, precision=PRECISION):
+    return f"{len(network)}-{tolerance_for_zoom(zoom)}-{precision}"
+
+
+# Base network payload: all segments of the network at the level of detail for zoom
+def base_payload(network, zoom, precision=PRECISION, weight=2.5):
+    tolerance = tolerance_for_zoom(zoom)
+    keep = network.level(tolerance) if tolerance is not None else np.ones(len(network.latlon), dtype=bool)
+    kept = np.concatenate([[0], np.cumsum(keep)])[network.offsets]
+    lines = encode_polylines(network.latlon[keep], kept, precision)
+    return {"version": base_version(network, zoom, precision), "precision": precision,
+            "weight": weight, "lines": lines}
+
+
+# Restyle payload: a color and a tooltip label per segment id of the base;
+# segments not in df are hidden
+def style_payload(network, df, color_column='color_hex'):
+    colors = [None] * len(network)
+    labels = [None] * len(network)
+    for segment, color, start, end, seats in zip(df.index, df[color_column], df['From'], df['To'], df['Seats']):
+        colors[segment] = color
+        labels[segment] = f"{start} - {end}: {seats:,.0f} seats"
+    return {"colors": colors, "labels": labels}
+
+
+# Station payload for the selected stations, versioned by its content
+def stations_payload(stations, colors, precision=PRECISION):
+    payload = {
+        "lat": np.round(stations['Lat-coord'].to_numpy(dtype=np.float64), precision).tolist(),
+        "lon": np.round(stations['Lng-coord'].to_numpy(dtype=np.float64), precision).tolist(),
+        "name": stations['Station'].astype(str).tolist(),
+        "color": list(colors),
+    }
+    payload["version"] = hashlib.sha1(repr(sorted(payload.items())).encode()).hexdigest()
+    return payload
+
+
+# Zoom level the frontend last reported, or zoom before it has reported one
+def view_zoom(zoom, key="rail_map"):
+    state = st.session_state.get(key)
+    return state.get("zoom", zoom) if isinstance(state, dict) else zoom
+
+
+# Render the persistent map. network is a snapshot that no other session
+# loads into (DatasetRegistry.snapshot), df the selected day's line data
+# from network.line_data (its index holds segment ids), stations the
+# selected station rows. Returns the frontend's last report:
+# {"base": ..., "zoom": ..., "click": [lat, lon] or None}.
+def rail_map(network, df, stations, station_colors, center, zoom,
+             height=600, precision=PRECISION, key="rail_map"):
+    state = st.session_state.get(key)
+    state = state if isinstance(state, dict) else {}
+    current_zoom = view_zoom(zoom, key)
+    version = base_version(network, current_zoom, precision)
+    return _component(
+        base=base_payload(network, current_zoom, precision) if state.get("base") != version else None,
+        base_version=version,
+        style=style_payload(network, df),
+        stations=stations_payload(stations, station_colors, precision),
+        center=center, zoom=zoom, height=height,
+        key=key, default=None,
+    )
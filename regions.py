@@ -0,0 +1,65 @@
+"""Region membership for station tables.
+
+Stations are labelled against region polygons in one vectorized pass per
+region (``shapely.intersects_xy`` on a prepared polygon), so a table of any
+size, such as the full European station list, is classified without a
+per-row loop. Polygons are (lon, lat) rings or shapely geometries.
+
+``RANDSTAD`` is the area Randstad.py used to test point by point: the
+latitude band from Dordrecht Zuid to Zaandijk Zaanse Schans, bounded in the
+east by Gorinchem's longitude and by the line from Gorinchem through
+Amersfoort Centraal. Its western edge is the coast.
+"""
+import numpy as np
+import pandas as pd
+import shapely
+
+NORTH = 52.469165802002  # Zaandijk Zaanse Schans
+SOUTH = 51.790000915527  # Dordrecht Zuid
+WEST = 3.8  # North Sea, west of Hoek van Holland
+GORINCHEM = (4.9683332443237, 51.833889007568)
+AMERSFOORT = (5.3705554008484, 52.153888702393)
+
+# Where the Gorinchem - Amersfoort line crosses the northern border
+_NORTH_EAST = GORINCHEM[0] + (NORTH - GORINCHEM[1]) / (AMERSFOORT[1] - GORINCHEM[1]) * (AMERSFOORT[0] - GORINCHEM[0])
+RANDSTAD = ((WEST, SOUTH), (GORINCHEM[0], SOUTH), GORINCHEM, AMERSFOORT, (_NORTH_EAST, NORTH), (WEST, NORTH))
+
+REGIONS = {"Randstad": RANDSTAD}
+
+
+def as_polygon(region):
+    polygon = region if isinstance(region, shapely.Geometry) else shapely.Polygon(region)
+    shapely.prepare(polygon)
+    return polygon
+
+
+# Boolean mask of the points inside (or on the border of) region
+def region_mask(lat, lon, region):
+    return shapely.intersects_xy(as_polygon(region), np.asarray(lon, dtype=np.float64),
+                                 np.asarray(lat, dtype=np.float64))
+
+
+# One 0.0/1.0 column per named region, in the format of the Randstad column
+def classify(stations, regions=REGIONS, lat='Lat-coord', lon='Lng-coord'):
+    return pd.DataFrame({name: region_mask(stations[lat], stations[lon], region).astype(np.float64)
+                         for name, region in regions.items()}, index=stations.index)
+
+
+# Name of the first region each station lies in, or default
+def region_names(stations, regions=REGIONS, default=None, lat='Lat-coord', lon='Lng-coord'):
+    names = pd.Series(default, index=stations.index, dtype=object)
+    unassigned = np.ones(len(stations), dtype=bool)
+    for name, region in regions.items():
+        inside = unassigned & region_mask(stations[lat], stations[lon], region)
+        names[inside] = name
+        unassigned &= ~inside
+    return names
+
+
+# stations with a 0.0/1.0 column per region added; columns the table
+# already has are kept unless overwrite is set
+def with_regions(stations, regions=REGIONS, overwrite=False):
+    missing = {name: region for name, region in regions.items() if overwrite or name not in stations.columns}
+    if not missing:
+        return stations
+    return stations.assign(**classify(stations, missing))
@@ -0,0 +1,194 @@
+"""Folium rendering of the processed line data and stations as single layers.
+
+Adding one ``folium.PolyLine`` per segment turns every segment into its own
+JavaScript variable and Leaflet layer. ``add_line_layer`` emits the whole
+network as one FeatureCollection instead, with Seats and color carried as
+feature properties and the style read from those properties in the browser.
+Coordinates are rounded to ``encoding.PRECISION`` decimals by default, or
+sent as encoded polylines that the browser decodes.
+
+``add_station_layer`` does the same for stations: one point layer on a
+canvas renderer, with the hit area widened by the renderer's tolerance and
+popups built from the feature properties when they open.
+"""
+import json
+import re
+
+from branca.element import MacroElement
+from jinja2 import Template
+import numpy as np
+
+from encoding import PRECISION, encode_polylines, round_coords
+
+
+# GeoJSON FeatureCollection for a processed line frame. From, To, Seats and
+# the color column (when present) become feature properties. Coordinates are
+# rounded to `precision` decimals and written in GeoJSON [lon, lat] order, or,
+# with encoded=True, as a Google encoded polyline in the '_line' property
+# (geometry left null) for the browser to decode.
+def lines_geojson(df, color_column='color_hex', precision=PRECISION, encoded=False):
+    properties = {name: df[name].tolist() for name in ('From', 'To', 'Seats') if name in df.columns}
+    if color_column in df.columns:
+        properties['color'] = df[color_column].tolist()
+    names = list(properties)
+    rows = list(zip(*properties.values())) if names else [()] * len(df)
+
+    # Nothing to draw for segments without coordinates
+    drawn = [i for i, latlon in enumerate(df['latlon_coords']) if latlon is not None and len(latlon)]
+    segments = [np.asarray(df['latlon_coords'].iloc[i], dtype=np.float64) for i in drawn]
+    offsets = np.concatenate([[0], np.cumsum([len(segment) for segment in segments])]).astype(np.int64)
+    latlon = np.concatenate(segments) if segments else np.empty((0, 2))
+
+    features = []
+    if encoded:
+        for i, line in zip(drawn, encode_polylines(latlon, offsets, precision)):
+            features.append({"type": "Feature", "geometry": None,
+                             "properties": dict(zip(names, rows[i]), _line=line)})
+    else:
+        coordinates = round_coords(latlon[:, ::-1], precision).tolist()
+        for i, start, end in zip(drawn, offsets[:-1], offsets[1:]):
+            features.append({"type": "Feature",
+                             "geometry": {"type": "LineString", "coordinates": coordinates[start:end]},
+                             "properties": dict(zip(names, rows[i]))})
+    return {"type": "FeatureCollection", "features": features}
+
+
+# JSON for embedding in a folium script. Branca parses rendered scripts as
+# Jinja templates again, so '{' is escaped where it would open a Jinja tag
+# (encoded polylines can contain '{{'), as are the HTML-sensitive characters.
+def script_json(data):
+    text = json.dumps(data)
+    text = text.replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026')
+    return re.sub(r'\{(?=[{%#])', r'\\u007b', text)
+
+
+class PropertyStyledGeoJson(MacroElement):
+    """GeoJSON layer styled in the browser from each feature's ``color``
+    property, so no per-feature style has to be serialized. Pass the
+    precision of ``encoded=True`` data as ``encoded_precision`` to have the
+    browser decode the '_line' polylines."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        {%- if this.precision is not none %}
+        function {{ this.get_name() }}_decode(line) {
+            var factor = Math.pow(10, {{ this.precision }}), index = 0, lat = 0, lng = 0, coordinates = [];
+            while (index < line.length) {
+                var delta = [0, 0];
+                for (var k = 0; k < 2; k++) {
+                    var result = 0, shift = 0, b;
+                    do {
+                        b = line.charCodeAt(index++) - 63;
+                        result |= (b & 0x1f) << shift;
+                        shift += 5;
+                    } while (b >= 0x20);
+                    delta[k] = (result & 1) ? ~(result >> 1) : (result >> 1);
+                }
+                lat += delta[0];
+                lng += delta[1];
+                coordinates.push([lng / factor, lat / factor]);
+            }
+            return coordinates;
+        }
+        var {{ this.get_name() }}_data = {{ this.data_json }};
+        {{ this.get_name() }}_data.features.forEach(function(feature) {
+            feature.geometry = {type: "LineString", coordinates: {{ this.get_name() }}_decode(feature.properties._line)};
+            delete feature.properties._line;
+        });
+        {%- else %}
+        var {{ this.get_name() }}_data = {{ this.data_json }};
+        {%- endif %}
+        var {{ this.get_name() }} = L.geoJson({{ this.get_name() }}_data, {
+            style: function(feature) {
+                return {
+                    color: feature.properties.color || {{ this.default_color|tojson }},
+                    weight: {{ this.weight|tojson }},
+                    opacity: {{ this.opacity|tojson }}
+                };
+            }
+        }).addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, data, weight=2.5, opacity=1, default_color='#3388ff', encoded_precision=None):
+        super().__init__()
+        self._name = 'PropertyStyledGeoJson'
+        self.data_json = script_json(data)
+        self.precision = encoded_precision
+        self.weight = weight
+        self.opacity = opacity
+        self.default_color = default_color
+
+
+# Add all segments of a processed line frame to the map as one layer, with
+# coordinates rounded to `precision` decimals or sent as encoded polylines
+def add_line_layer(m, df, color_column='color_hex', weight=2.5, opacity=1,
+                   precision=PRECISION, encoded=False):
+    data = lines_geojson(df, color_column, precision, encoded)
+    PropertyStyledGeoJson(data, weight=weight, opacity=opacity,
+                          encoded_precision=precision if encoded else None).add_to(m)
+    return m
+
+
+# GeoJSON FeatureCollection of station points, with the station name and its
+# marker color as properties
+def stations_geojson(stations, colors, precision=PRECISION):
+    lonlat = round_coords(stations[['Lng-coord', 'Lat-coord']].to_numpy(dtype=np.float64), precision).tolist()
+    return {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": point},
+         "properties": {"name": name, "color": color}}
+        for point, name, color in zip(lonlat, stations['Station'].astype(str), colors)]}
+
+
+class StationLayer(MacroElement):
+    """Station points drawn as circle markers on one canvas renderer. Clicks
+    and hovers within ``hit_radius`` pixels of a station hit it, and popups
+    and tooltips are created from the ``name`` property when first shown."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }}_renderer = L.canvas({tolerance: {{ this.tolerance|tojson }}});
+        var {{ this.get_name() }} = L.geoJson({{ this.data_json }}, {
+            pointToLayer: function(feature, latlng) {
+                return L.circleMarker(latlng, {
+                    renderer: {{ this.get_name() }}_renderer,
+                    radius: {{ this.radius|tojson }},
+                    color: feature.properties.color,
+                    fill: true,
+                    fillOpacity: {{ this.fill_opacity|tojson }}
+                });
+            }
+        });
+        {%- if this.popup %}
+        {{ this.get_name() }}.bindPopup(function(layer) {
+            return document.createTextNode(layer.feature.properties.name);
+        });
+        {%- endif %}
+        {%- if this.tooltip %}
+        {{ this.get_name() }}.bindTooltip(function(layer) {
+            return document.createTextNode(layer.feature.properties.name);
+        });
+        {%- endif %}
+        {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, data, radius=1, hit_radius=8, fill_opacity=1, popup=True, tooltip=True):
+        super().__init__()
+        self._name = 'StationLayer'
+        self.data_json = script_json(data)
+        self.radius = radius
+        self.tolerance = max(hit_radius - radius, 0)
+        self.fill_opacity = fill_opacity
+        self.popup = popup
+        self.tooltip = tooltip
+
+
+# Add all selected stations to the map as one layer; colors holds a marker
+# color per station row
+def add_station_layer(m, stations, colors, radius=1, hit_radius=8, fill_opacity=1,
+                      popup=True, tooltip=True, precision=PRECISION):
+    data = stations_geojson(stations, colors, precision)
+    StationLayer(data, radius=radius, hit_radius=hit_radius, fill_opacity=fill_opacity,
+                 popup=popup, tooltip=tooltip).add_to(m)
+    return m
@@ -0,0 +1,77 @@
+"""Zoom-dependent polyline simplification for the rail segments.
+
+The PlotData geometries hold dozens of vertices for a few hundred metres of
+track, far more than a map shows at national zoom levels. ``simplify_mask``
+runs Douglas-Peucker over every segment of a coordinate buffer and returns
+which vertices to keep. The first and last vertex of each segment are always
+kept, so adjacent segments still meet at their shared endpoints.
+
+Tolerances are in the units of the buffer; pass UTM coordinates to work in
+metres. ``tolerance_for_zoom`` picks the precomputed level whose error stays
+below half a screen pixel at a given Leaflet zoom level.
+"""
+import math
+
+import numpy as np
+
+# Precomputed simplification levels, in metres
+LOD_TOLERANCES = (2, 8, 32, 128, 512)
+
+# Metres per pixel at zoom 0 on the equator for 256 px Web Mercator tiles
+METRES_PER_PIXEL_Z0 = 156543.03392
+REFERENCE_LATITUDE = 52.1  # The Netherlands
+
+
+# Douglas-Peucker keep-mask for one polyline of shape (n, 2)
+def douglas_peucker(points, tolerance):
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n <= 2:
+        keep[:] = True
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        distances = _segment_distances(points[start + 1:end], points[start], points[end])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
+
+
+# Distance from each point to the line segment a-b
+def _segment_distances(points, a, b):
+    ab = b - a
+    length2 = float(ab @ ab)
+    if length2 == 0.0:
+        return np.hypot(*(points - a).T)
+    t = np.clip(((points - a) @ ab) / length2, 0.0, 1.0)
+    closest = a + t[:, None] * ab
+    return np.hypot(*(points - closest).T)
+
+
+# Keep-mask over a whole coordinate buffer, segment by segment
+def simplify_mask(coords, offsets, tolerance):
+    keep = np.ones(len(coords), dtype=bool)
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        keep[start:end] = douglas_peucker(coords[start:end], tolerance)
+    return keep
+
+
+# Ground distance covered by one screen pixel at a Leaflet zoom level
+def metres_per_pixel(zoom, latitude=REFERENCE_LATITUDE):
+    return METRES_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / 2 ** zoom
+
+
+# Coarsest precomputed tolerance that stays within half a pixel at zoom;
+# None means the full-resolution geometry is needed
+def tolerance_for_zoom(zoom, tolerances=LOD_TOLERANCES):
+    limit = metres_per_pixel(zoom) / 2
+    fitting = [tolerance for tolerance in tolerances if tolerance <= limit]
+    return max(fitting) if fitting else None
@@ -0,0 +1,93 @@
+"""Spatial index over the rail network segments and the stations.
+
+``NetworkIndex`` builds two STR-trees once: one over the segment
+geometries in UTM metres (``RailNetwork.coords``) and one over the stations,
+projected to the same metres. Point queries take lat/lon, as clicked on a
+map, and answer from the trees instead of scanning every LINESTRING:
+the nearest segment with its From/To and Seats, the nearest stations, and
+the segments within a distance of a station. Station-level aggregates go
+through a ``StationJoin`` on the network's station-code ids.
+"""
+import numpy as np
+import pandas as pd
+import shapely
+
+from projection import SOURCE_CRS, TARGET_CRS, project_coords
+from station_codes import StationJoin
+
+
+# UTM metres for (n, 2) lat/lon points
+def to_metres(latlon):
+    return project_coords(np.asarray(latlon, dtype=np.float64).reshape(-1, 2), TARGET_CRS, SOURCE_CRS)
+
+
+class NetworkIndex:
+    def __init__(self, network, stations=None):
+        self.network = network
+        segment_ids = np.repeat(np.arange(len(network)), np.diff(network.offsets))
+        self.lines = shapely.linestrings(network.coords, indices=segment_ids)
+        self.segment_tree = shapely.STRtree(self.lines)
+
+        self.stations = stations.reset_index(drop=True) if stations is not None else None
+        if self.stations is not None:
+            self.points = shapely.points(to_metres(self.stations[['Lat-coord', 'Lng-coord']].to_numpy()))
+            self.station_tree = shapely.STRtree(self.points)
+            station_ids = network.codes.ids(self.stations['Code'])
+            self.join = StationJoin(network.code_ids, station_ids, len(network.codes))
+
+    # Nearest segment to a lat/lon point, as a Series with its id, From, To,
+    # distance in metres and (given a day) the Seats on it; None when no
+    # segment lies within max_distance metres
+    def nearest_segment(self, lat, lon, day=None, max_distance=None):
+        point = shapely.Point(to_metres([lat, lon])[0])
+        segments, distances = self.segment_tree.query_nearest(point, max_distance=max_distance,
+                                                              return_distance=True)
+        if not len(segments):
+            return None
+        segment = int(segments[0])
+        result = {"segment": segment, "From": self.network.segments.at[segment, "From"],
+                  "To": self.network.segments.at[segment, "To"], "distance": float(distances[0])}
+        if day is not None:
+            result["Seats"] = self.network.day_seats(day).iloc[segment]
+        return pd.Series(result)
+
+    # The k stations nearest to a lat/lon point, closest first, with their
+    # distance in metres
+    def nearest_stations(self, lat, lon, k=1):
+        point = shapely.Point(to_metres([lat, lon])[0])
+        k = min(k, len(self.points))
+        if k == 1:
+            rows, distances = self.station_tree.query_nearest(point, return_distance=True, all_matches=False)
+        else:
+            # Widen the search radius until it holds k stations
+            radius = float(shapely.distance(point, self.points[self.station_tree.nearest(point)]))
+            radius = max(radius, 1.0)
+            while True:
+                rows = self.station_tree.query(point, predicate="dwithin", distance=radius)
+                if len(rows) >= k:
+                    break
+                radius *= 2
+            distances = shapely.distance(point, self.points[rows])
+            order = np.argsort(distances, kind="stable")[:k]
+            rows, distances = rows[order], distances[order]
+        return self.stations.iloc[rows].assign(distance=distances)
+
+    # Segments within radius metres of station row i, closest first
+    def segments_near_station(self, i, radius):
+        point = self.points[i]
+        segments = self.segment_tree.query(point, predicate="dwithin", distance=radius)
+        distances = shapely.distance(point, self.lines[segments])
+        order = np.argsort(distances, kind="stable")
+        return self.network.segments.iloc[segments[order]].assign(distance=distances[order])
+
+    # Seats through every station row on a day: the sum over the segments
+    # that start or end there
+    def station_seats(self, day):
+        return self.join.station_totals(self.network.day_seats(day).to_numpy())
+
+    # Segments that start or end at station row i, with their Seats on a day
+    def station_segments(self, i, day=None):
+        segments = self.network.segments.iloc[self.join.segments_at(i)]
+        if day is None:
+            return segments
+        return segments.assign(Seats=self.network.day_seats(day).to_numpy()[segments.index])
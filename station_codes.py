@@ -0,0 +1,108 @@
+"""Shared station-code dictionary and segment-station join arrays.
+
+Station codes turn up in several spellings: PlotData segments use ``From``
+and ``To`` (``Sd``, ``BRN``), the station tables ``Code`` and the operator
+feeds ``UserStopCodeBegin``/``UserStopCodeEnd`` (``Gr``, ``Ddr``).
+``CodeDictionary`` maps all of them, case-insensitively, to dense integer
+ids that only grow, so a code keeps its id as new sources are added and
+categoricals built from it share one set of categories.
+
+``StationJoin`` resolves segment ends to station rows once, as integer
+arrays, after which station-level aggregates (seats through a station,
+segments at a station) are array gathers and ``bincount`` instead of string
+merges.
+"""
+import numpy as np
+import pandas as pd
+
+
+# Upper-cased categorical; categories that only differ in case are merged.
+# Only the distinct values are upper-cased.
+def upper_categorical(values):
+    column = values if isinstance(values.dtype, pd.CategoricalDtype) else pd.Series(values, dtype="category")
+    categories, inverse = np.unique(column.cat.categories.astype(str).str.upper(), return_inverse=True)
+    codes = column.cat.codes.to_numpy()
+    return pd.Categorical.from_codes(np.where(codes >= 0, inverse[codes], -1), categories)
+
+
+class CodeDictionary:
+    """Append-only mapping of upper-cased station codes to ids 0..n-1."""
+
+    def __init__(self, codes=()):
+        self.codes = pd.Index([], dtype=object)
+        self.add(codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    # Give every unseen code the next free id
+    def add(self, values):
+        upper = upper_categorical(pd.Series(values, dtype=object)).categories
+        new = upper[~upper.isin(self.codes)]
+        if len(new):
+            self.codes = self.codes.append(pd.Index(new, dtype=object))
+        return self
+
+    # int32 id per value; -1 for missing values and (unless add) unknown codes
+    def ids(self, values, add=False):
+        column = upper_categorical(pd.Series(values, dtype=object))
+        if add:
+            self.add(column.categories)
+        # Look up the distinct codes only, then gather per row
+        lookup = self.codes.get_indexer(column.categories).astype(np.int32)
+        codes = column.codes
+        return np.where(codes >= 0, lookup[codes], -1).astype(np.int32)
+
+    # Categorical over the dictionary's codes, so categoricals of different
+    # sources can be compared and joined on their integer codes
+    def categorical(self, values, add=True):
+        return pd.Categorical.from_codes(self.ids(values, add), categories=self.codes)
+
+
+class StationJoin:
+    """Segment ends resolved to station rows, for integer-only joins.
+
+    segment_ids is an (n, 2) array of dictionary ids for (From, To), and
+    station_ids one id per station row.
+    """
+
+    def __init__(self, segment_ids, station_ids, dictionary_size):
+        # Dictionary id -> station row (the first row, for duplicate codes), -1 for none
+        row_of_code = np.full(dictionary_size + 1, -1, dtype=np.int64)
+        known = station_ids >= 0
+        rows = np.flatnonzero(known)
+        row_of_code[station_ids[known][::-1]] = rows[::-1]
+        self.station_count = len(station_ids)
+        # Index -1 (unknown code) hits the trailing -1 slot
+        self.ends = row_of_code[np.asarray(segment_ids)]  # segments x 2 station rows
+
+        # Segments per station, CSR style: segments_at(i) = by_station[offsets[i]:offsets[i + 1]]
+        stations = self.ends.ravel()
+        segments = np.repeat(np.arange(len(self.ends)), 2)
+        valid = stations >= 0
+        order = np.argsort(stations[valid], kind="stable")
+        self.by_station = segments[valid][order]
+        counts = np.bincount(stations[valid], minlength=self.station_count)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    @classmethod
+    def from_codes(cls, dictionary, segments, stations, code="Code"):
+        segment_ids = np.column_stack([dictionary.ids(segments["From"], add=True),
+                                       dictionary.ids(segments["To"], add=True)])
+        station_ids = dictionary.ids(stations[code], add=True)
+        return cls(segment_ids, station_ids, len(dictionary))
+
+    # Segment ids that start or end at station row i
+    def segments_at(self, i):
+        return self.by_station[self.offsets[i]:self.offsets[i + 1]]
+
+    # Sum of a per-segment value over the segments at every station, e.g.
+    # the seats through each station; NaN values count as zero
+    def station_totals(self, values):
+        values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+        totals = np.zeros(self.station_count)
+        for end in (0, 1):
+            rows = self.ends[:, end]
+            valid = rows >= 0
+            totals += np.bincount(rows[valid], values[valid], minlength=self.station_count)
+        return totals
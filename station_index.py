@@ -0,0 +1,31 @@
+"""Station table indexed by (Randstad, Type code).
+
+The apps filter stations on the Randstad flag and the station type code on
+every rerun. ``StationIndex`` groups the row positions by those two keys
+once, so a selection only combines the matching groups instead of testing
+every row, and returns the selected rows as one frame in table order.
+"""
+import numpy as np
+
+
+class StationIndex:
+    def __init__(self, stations):
+        self.stations = stations
+        # (Randstad, Type code) -> row positions; rows with missing values keep their own group
+        self.groups = stations.groupby(['Randstad', 'Type code'], dropna=False, sort=False).indices
+
+    def __len__(self):
+        return len(self.stations)
+
+    # Row positions whose Randstad value is in randstad and whose type code is
+    # in type_codes; None leaves that key unrestricted
+    def positions(self, randstad=None, type_codes=None):
+        parts = [rows for (region, code), rows in self.groups.items()
+                 if (randstad is None or region in randstad)
+                 and (type_codes is None or code in type_codes)]
+        if not parts:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(parts))
+
+    def select(self, randstad=None, type_codes=None):
+        return self.stations.iloc[self.positions(randstad, type_codes)]
@@ -5,6 +5,9 @@ from pathlib import Path
 import numpy as np
 import pydeck as pdk
 
+from checkins import CHECKINS_PATH, CheckinCube
+from downsample import POINT_BUDGET, downsample
+
 # Set the title and favicon that appear in the Browser's tab bar.
 st.set_page_config(
     page_title='NS Train Capacity',
@@ -14,28 +17,14 @@ st.set_page_config(
 # -----------------------------------------------------------------------------
 # Declare some useful functions.
 
-@st.cache_data
-def get_gdp_data():
-    """Grab GDP data from a CSV file.
+@st.cache_resource
+def get_checkin_cube():
+    """Check-in totals per year, month, day and hour, aggregated once.
 
-    This uses caching to avoid having to read the file every time. If we were
-    reading from an HTTP endpoint instead of a file, it's a good idea to set
-    a maximum age to the cache with the TTL argument: @st.cache_data(ttl='1d')
+    The cube is shared by all sessions; widget interactions only filter
+    its pre-aggregated frames.
     """
-
-    # Instead of a CSV on disk, you could read from an HTTP endpoint here too.
-    DATA_FILENAME = Path(__file__).parent/'data/train_data.csv'
-    raw_gdp_df = pd.read_csv(DATA_FILENAME, sep=";")
-
-    MIN_YEAR = 2020
-    MAX_YEAR = 2022
-    gdp_df = raw_gdp_df.melt(
-        ['Maand'],
-        'Maand',
-        'Aantal_check_ins',
-    )
-
-    return raw_gdp_df
+    return CheckinCube.from_csv(Path(__file__).parent/CHECKINS_PATH)
 
 @st.cache_data
 def get_ranstad_data():
@@ -52,7 +41,7 @@ def get_ranstad_data():
 
     return raw_gdp_df
 
-gdp_df = get_gdp_data()
+checkins = get_checkin_cube()
 
 stations = get_ranstad_data()
 # -----------------------------------------------------------------------------
@@ -72,7 +61,7 @@ But it's otherwise a great (and did I mention _free_?) source of data.
 ''
 ''
 
-years = gdp_df['Jaar'].unique()
+years = checkins.years()
 
 if not len(years):
    st.warning("Select at least one country")
@@ -80,8 +69,7 @@ selected_year = st.selectbox(
     'Which year would you like to view?',
     years)
 
-df_sum = gdp_df.groupby(['Jaar', 'Maand'])['Aantal_check_ins'].sum().reset_index()
-df_sum_sel = df_sum[df_sum['Jaar']==selected_year]
+df_sum_sel = checkins.query('month', Jaar=selected_year)
 
 st.header('Check-ins over time', divider='gray')
 
@@ -94,6 +82,23 @@ st.line_chart(
     #color='Jaar',
 )
 
+st.header('Check-ins in detail', divider='gray')
+
+first_year, last_year = st.select_slider(
+    'Which years would you like to view?',
+    options=list(years),
+    value=(years[0], years[-1]))
+grain = st.radio('Resolution', ['day', 'hour'], horizontal=True)
+
+# Reduced to a fixed number of points server-side, so the chart stays
+# equally light for any range
+detail = checkins.timeline(grain, first_year, last_year)
+st.line_chart(
+    downsample(detail, 'Tijd', ['Aantal_check_ins'], POINT_BUDGET),
+    x='Tijd',
+    y='Aantal_check_ins',
+)
+
 x = st.slider('x')  # 👈 this is a widget
 st.write(x, 'squared is', x * x)
 
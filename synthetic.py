@@ -0,0 +1,149 @@
+"""Synthetic PlotData networks and station tables at a chosen scale.
+
+Benchmarks need inputs larger than the shipped data, and they must not
+depend on downloads. ``synthetic_network`` lays ``scale`` times the current
+number of stations (``BASE_STATIONS``) on a jittered grid over the
+Netherlands' UTM extent and links neighbours into about ``scale`` times the
+current number of segments (``BASE_SEGMENTS``). Each segment is a
+LINESTRING of around ``POINTS_PER_SEGMENT`` wiggling points. Seats follow
+the spread of the real day files. The frames have the columns and
+formats of the real files, so every pipeline stage reads them unchanged.
+
+    $ python synthetic.py --scale 10 --out-dir /tmp/synthetic
+"""
+import argparse
+import os
+import string
+
+import numpy as np
+import pandas as pd
+
+from colormap import capacity_rgb, rgb_strings
+from network import DAYS
+from projection import project_coords
+
+BASE_STATIONS = 397  # Stations in Randstad-0.csv
+BASE_SEGMENTS = 470  # Distinct (From, To) segments over the seven day files
+POINTS_PER_SEGMENT = 26  # Mean LINESTRING length in the day files
+EXTENT = ((541_000, 5_636_000), (766_000, 5_902_000))  # UTM 31N bounds of the network
+SEATS_MEDIAN = 460_000
+SEATS_SIGMA = 0.65  # Log-normal spread of the week totals; a day gets about a seventh
+STATION_TYPES = (("stoptreinstation", 0), ("knooppuntStoptreinstation", 2), ("intercitystation", 1),
+                 ("knooppuntIntercitystation", 1), ("megastation", 1))
+TYPE_WEIGHTS = (0.7, 0.12, 0.05, 0.1, 0.03)
+
+
+# Distinct upper-case letter codes (A..Z, AA..ZZ, ...), skipping the one-letter ones
+def station_codes(count):
+    letters = np.array(list(string.ascii_uppercase))
+    codes, width = [], 2
+    while len(codes) < count:
+        needed = min(count - len(codes), 26 ** width)
+        digits = np.arange(needed)[:, None] // 26 ** np.arange(width - 1, -1, -1) % 26
+        codes.extend("".join(row) for row in letters[digits])
+        width += 1
+    return codes
+
+
+# Station positions in UTM metres on a jittered grid over EXTENT
+def _station_positions(count, rng):
+    (west, south), (east, north) = EXTENT
+    columns = max(int(np.ceil(np.sqrt(count * (east - west) / (north - south)))), 2)
+    rows = int(np.ceil(count / columns))
+    cell = np.array([(east - west) / columns, (north - south) / rows])
+    grid = np.stack(np.divmod(np.arange(count), columns)[::-1], axis=1)
+    jitter = rng.uniform(0.15, 0.85, size=(count, 2))
+    return np.array([west, south]) + (grid + jitter) * cell, columns
+
+
+# Station table in the format of data/Randstad-0.csv
+def synthetic_stations(scale=1, seed=0):
+    rng = np.random.default_rng(seed)
+    count = int(round(BASE_STATIONS * scale))
+    xy, _ = _station_positions(count, rng)
+    latlon = project_coords(xy)
+    types = rng.choice(len(STATION_TYPES), size=count, p=TYPE_WEIGHTS)
+    return pd.DataFrame({
+        "uic": 8400000 + np.arange(count),
+        "Station": [f"Station {code.title()}" for code in station_codes(count)],
+        "Code": station_codes(count),
+        "Lat-coord": latlon[:, 0].round(5),
+        "Lng-coord": latlon[:, 1].round(5),
+        "Type": [STATION_TYPES[t][0] for t in types],
+        "Type code": [STATION_TYPES[t][1] for t in types],
+        "Randstad": (rng.random(count) < 0.3).astype(np.float64),
+    })
+
+
+# WKT LINESTRINGs for (n, 2) point blocks split at offsets
+def _wkt(coords, offsets):
+    text = np.char.add(np.char.add(coords[:, 0].round(6).astype(str), " "), coords[:, 1].round(6).astype(str))
+    return ["LINESTRING (" + ", ".join(text[start:end]) + ")" for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+# PlotData frame (index, From, To, Seats, geometry, color) whose stations
+# match synthetic_stations(scale, seed); day shifts the seats only
+def synthetic_network(scale=1, seed=0, day=0):
+    rng = np.random.default_rng(seed)
+    count = int(round(BASE_STATIONS * scale))
+    xy, columns = _station_positions(count, rng)
+    codes = np.array(station_codes(count))
+
+    # Every station links to its right-hand neighbour, and some to the one
+    # above, to give about BASE_SEGMENTS * scale segments
+    start = np.arange(count)
+    right = start[(start % columns < columns - 1) & (start + 1 < count)]
+    up_share = max(BASE_SEGMENTS / BASE_STATIONS - len(right) / count, 0)
+    up = start[(start + columns < count) & (rng.random(count) < up_share)]
+    ends = np.concatenate([np.column_stack([right, right + 1]), np.column_stack([up, up + columns])])
+
+    # Straight lines between the ends, bent by a sine with a random amplitude
+    points = np.maximum(rng.poisson(POINTS_PER_SEGMENT - 2, len(ends)) + 2, 2)
+    offsets = np.concatenate([[0], np.cumsum(points)])
+    segment = np.repeat(np.arange(len(ends)), points)
+    t = (np.arange(offsets[-1]) - offsets[segment]) / (points[segment] - 1)
+    a, b = xy[ends[segment, 0]], xy[ends[segment, 1]]
+    normal = (b - a)[:, ::-1] * [-1, 1]
+    bend = rng.normal(0, 0.05, len(ends))[segment] * np.sin(np.pi * t)
+    coords = a + (b - a) * t[:, None] + normal * bend[:, None]
+
+    seats = np.round(SEATS_MEDIAN * np.exp(rng.normal(0, SEATS_SIGMA, len(ends))))
+    seats = np.round(seats * np.random.default_rng(seed + 1 + day).uniform(0.8, 1.2, len(ends)) / 7)
+    norm = (seats - seats.min()) / (seats.max() - seats.min())
+    return pd.DataFrame({
+        "index": np.arange(len(ends)),
+        "From": codes[ends[:, 0]],
+        "To": codes[ends[:, 1]],
+        "Seats": seats,
+        "geometry": _wkt(coords, offsets),
+        "color": rgb_strings(capacity_rgb(norm)),
+    })
+
+
+# Write PlotData<day>.csv per day and Stations.csv for one scale; returns
+# ({day: path}, stations path)
+def write_dataset(out_dir, scale=1, seed=0, days=DAYS):
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {}
+    for i, day in enumerate(days):
+        paths[day] = os.path.join(out_dir, f"PlotData{day}.csv")
+        synthetic_network(scale, seed, i).to_csv(paths[day])
+    stations_path = os.path.join(out_dir, "Stations.csv")
+    synthetic_stations(scale, seed).to_csv(stations_path)
+    return paths, stations_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic PlotData network and station table.")
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", nargs="+", default=list(DAYS))
+    parser.add_argument("--out-dir", default="OutputData/Synthetic")
+    args = parser.parse_args()
+    paths, stations_path = write_dataset(args.out_dir, args.scale, args.seed, args.days)
+    for path in [*paths.values(), stations_path]:
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
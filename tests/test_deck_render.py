@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from colormap import capacity_colors, capacity_rgb
+from deck_render import hex_rgb
+
+
+def test_hex_rgb_reads_upper_and_lower_case():
+    assert hex_rgb(["#ff8000", "#0A0b0C"]).tolist() == [[255, 128, 0], [10, 11, 12]]
+
+
+def test_hex_rgb_matches_the_capacity_colors():
+    norm = np.linspace(0, 1, 50)
+    np.testing.assert_array_equal(hex_rgb(capacity_colors(norm)), capacity_rgb(norm))
+
+
+def test_hex_rgb_of_nothing_is_empty():
+    assert hex_rgb([]).shape == (0, 3)
+
+
+@pytest.mark.parametrize("color", ["#f80", "ff8000", "#ff80000", "#gg8000", "[1.0, 0.5, 0.0]", ""])
+def test_hex_rgb_rejects_other_formats(color):
+    with pytest.raises(ValueError, match="rrggbb"):
+        hex_rgb(["#ffffff", color])
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from downsample import downsample, lttb, minmax
+
+
+def series(n=10_000, seed=0):
+    rng = np.random.default_rng(seed)
+    y = np.cumsum(rng.normal(size=n))
+    y[n // 8] += 500  # A spike a chart must show
+    return np.arange(n, dtype=np.float64), y
+
+
+def test_lttb_keeps_the_budget_the_ends_and_the_spike():
+    x, y = series()
+    picks = lttb(x, y, 500)
+    assert len(picks) == 500
+    assert picks[0] == 0 and picks[-1] == len(x) - 1
+    assert np.all(np.diff(picks) > 0)
+    assert len(x) // 8 in picks
+
+
+def test_lttb_picks_one_point_per_bucket():
+    x, y = series(n=12)
+    # Buckets over the interior points 1..10 are [1, 3), [3, 6), [6, 8), [8, 11)
+    picks = lttb(x, y, 6)
+    edges = [1, 3, 6, 8, 11]
+    assert all(start <= pick < end for pick, start, end in zip(picks[1:-1], edges[:-1], edges[1:]))
+
+
+def test_short_series_are_kept_whole():
+    x, y = series(n=50)
+    assert lttb(x, y, 100).tolist() == list(range(50))
+    assert minmax(y, 100).tolist() == list(range(50))
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    _, y = series()
+    picks = minmax(y, 200)
+    assert len(picks) <= 200
+    assert picks[0] == 0 and picks[-1] == len(y) - 1
+    assert np.argmax(y) in picks and np.argmin(y) in picks
+
+
+def test_downsample_keeps_the_rows_every_column_needs():
+    x, y = series()
+    df = pd.DataFrame({"Tijd": pd.date_range("2020-01-01", periods=len(x), freq="h"), "a": y, "b": -y[::-1]})
+    reduced = downsample(df, "Tijd", ["a", "b"], budget=300, method="minmax")
+    assert df["a"].idxmax() in reduced.index and df["b"].idxmax() in reduced.index
+    assert reduced.index.is_monotonic_increasing
+    short = df.head(100)
+    assert downsample(short, "Tijd", ["a"], budget=300) is short
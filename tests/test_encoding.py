@@ -0,0 +1,43 @@
+import numpy as np
+
+from encoding import encode_polylines, round_coords
+
+
+# Reference decoder, as the browser runs it
+def decode(text, precision=5):
+    values, value, shift = [], 0, 0
+    for char in text:
+        chunk = ord(char) - 63
+        value |= (chunk & 0x1f) << shift
+        shift += 5
+        if chunk < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value, shift = 0, 0
+    return np.cumsum(np.array(values).reshape(-1, 2), axis=0) / 10 ** precision
+
+
+def test_google_reference_polyline():
+    latlon = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    assert encode_polylines(latlon, [0, 3]) == ["_p~iF~ps|U_ulLnnqC_mqNvxq`@"]
+
+
+def test_segments_restart_from_zero_and_empty_segments_stay_empty():
+    latlon = np.array([(52.0, 5.0), (52.1, 5.1), (51.5, 4.5), (51.6, 4.4)])
+    lines = encode_polylines(latlon, [0, 2, 2, 4])
+    assert lines[1] == ""
+    assert lines[2] == encode_polylines(latlon[2:], [0, 2])[0]
+    np.testing.assert_allclose(decode(lines[0]), latlon[:2])
+
+
+def test_round_trip_at_precision():
+    rng = np.random.default_rng(0)
+    latlon = rng.uniform([50, 3], [54, 7], size=(200, 2))
+    offsets = np.array([0, 1, 50, 50, 200])
+    lines = encode_polylines(latlon, offsets, precision=6)
+    for line, start, end in zip(lines, offsets[:-1], offsets[1:]):
+        decoded = decode(line, 6) if line else np.empty((0, 2))
+        np.testing.assert_allclose(decoded, round_coords(latlon[start:end], 6), atol=1e-9)
+
+
+def test_no_points_gives_empty_lines():
+    assert encode_polylines(np.empty((0, 2)), [0, 0, 0]) == ["", ""]
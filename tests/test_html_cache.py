@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from html_cache import RenderCache, size_of
+
+
+def test_least_recently_used_view_is_evicted_first():
+    value = "x" * 100
+    cache = RenderCache(max_bytes=3 * size_of(value))
+    for key in "abc":
+        cache.put(key, value)
+    cache.get("a")
+    cache.put("d", value)
+    assert "b" not in cache
+    assert all(key in cache for key in "acd")
+    assert cache.bytes == 3 * size_of(value)
+    assert cache.evictions == 1
+
+
+def test_replacing_a_key_keeps_the_byte_count():
+    cache = RenderCache()
+    cache.put("a", "x" * 10)
+    cache.put("a", "x" * 1000)
+    assert len(cache) == 1
+    assert cache.bytes == size_of("x" * 1000)
+
+
+def test_a_value_larger_than_the_cache_is_returned_but_not_kept():
+    cache = RenderCache(max_bytes=100)
+    cache.put("small", "x")
+    assert cache.put("big", "x" * 1000) == "x" * 1000
+    assert "big" not in cache and "small" in cache
+
+
+def test_get_or_render_renders_on_a_miss_only():
+    cache = RenderCache()
+    calls = []
+    render = lambda: calls.append(1) or ("<html>", 1, 2)
+    assert cache.get_or_render("view", render) == ("<html>", 1, 2)
+    assert cache.get_or_render("view", render) == ("<html>", 1, 2)
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_concurrent_misses_render_once():
+    cache = RenderCache()
+    calls = []
+
+    def render():
+        calls.append(1)
+        time.sleep(0.1)
+        return "<html>"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_render("view", render)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == ["<html>"] * 8
+
+
+def test_a_failed_render_is_not_cached():
+    cache = RenderCache()
+
+    def fail():
+        raise RuntimeError("render failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_render("view", fail)
+    assert cache.get_or_render("view", lambda: "<html>") == "<html>"
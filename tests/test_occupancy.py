@@ -0,0 +1,89 @@
+import os
+
+import pandas as pd
+import pytest
+
+from occupancy import (CAPACITY, PartialStore, SeatsAggregator, SegmentGraph, WEEK_FILE, aggregate_feeds, ingest,
+                       route, write_weekly)
+
+MONDAY = "2024-10-07"
+TUESDAY = "2024-10-08"
+GTW = 55 * 3  # Seats of a three-coach GTW
+
+
+# A - B - C in a line, plus a detour A - D - C that is longer
+@pytest.fixture
+def graph():
+    pairs = [("A", "B"), ("B", "C"), ("A", "D"), ("D", "C")]
+    geometry = ["LINESTRING (0 0, 1 0)", "LINESTRING (1 0, 2 0)", "LINESTRING (0 0, 1 5)", "LINESTRING (1 5, 2 0)"]
+    return SegmentGraph(pairs, geometry, [1, 1, 5, 5])
+
+
+def write_feed(path, rows):
+    pd.DataFrame(rows, columns=["DataOwnerCode", "OperatingDay", "UserStopCodeBegin", "UserStopCodeEnd",
+                                "VehicleType", "TotalNumberOfCoaches"]).to_csv(path)
+    return str(path)
+
+
+def test_aggregator_sums_seats_per_day_and_link():
+    chunk = pd.DataFrame({"DataOwnerCode": ["ARR"] * 3, "OperatingDay": [MONDAY] * 3,
+                          "UserStopCodeBegin": ["a", "A", "A"], "UserStopCodeEnd": ["b", "B", "B"],
+                          "VehicleType": ["GTW", "GTW", "Tram"], "TotalNumberOfCoaches": [None, 2.0, 1.0]})
+    aggregator = SeatsAggregator(CAPACITY).add(chunk)
+    assert aggregator.result()[(MONDAY, "A", "B")] == GTW + 55 * 2
+    assert aggregator.rows == 3
+    assert aggregator.unknown_rows == 1
+
+
+def test_route_spreads_link_seats_over_the_shortest_path(graph):
+    seats = pd.Series([100.0, 10.0], name="Seats", index=pd.MultiIndex.from_tuples(
+        [(MONDAY, "A", "C"), (MONDAY, "Y", "X")], names=["OperatingDay", "From", "To"]))
+    routed, unrouted = route(seats, graph)
+    assert routed.to_dict() == {(MONDAY, "A", "B"): 100.0, (MONDAY, "B", "C"): 100.0, (MONDAY, "X", "Y"): 10.0}
+    assert unrouted == [("Y", "X")]
+
+
+def test_route_adds_both_directions_on_the_reference_orientation(graph):
+    seats = pd.Series([1.0, 2.0], name="Seats", index=pd.MultiIndex.from_tuples(
+        [(MONDAY, "A", "B"), (MONDAY, "B", "A")], names=["OperatingDay", "From", "To"]))
+    routed, _ = route(seats, graph)
+    assert routed.to_dict() == {(MONDAY, "A", "B"): 3.0}
+
+
+def test_aggregate_feeds_streams_chunks(tmp_path):
+    rows = [("ARR", MONDAY, "A", "B", "GTW", 3)] * 5
+    aggregator = aggregate_feeds([write_feed(tmp_path / "feed.csv", rows)], chunksize=2)
+    assert aggregator.result()[(MONDAY, "A", "B")] == 5 * GTW
+
+
+def test_first_ingest_of_a_partial_week_writes_the_week_file(tmp_path, graph):
+    feed = write_feed(tmp_path / "feed.csv", [("ARR", MONDAY, "A", "C", "GTW", 3)])
+    store = PartialStore(str(tmp_path / "state"))
+    weekdays, unrouted, _ = ingest([feed], store, graph)
+    assert weekdays == ["Monday"] and unrouted == []
+
+    paths = write_weekly(store, graph, str(tmp_path / "out"), weekdays)
+    week = pd.read_csv(tmp_path / "out" / f"PlotData{WEEK_FILE}.csv")
+    assert str(tmp_path / "out" / f"PlotData{WEEK_FILE}.csv") in paths
+    assert week.set_index(["From", "To"])["Seats"].to_dict() == {("A", "B"): GTW, ("B", "C"): GTW}
+    assert week["geometry"].notna().all()
+
+
+def test_resent_day_replaces_its_partial(tmp_path, graph):
+    store = PartialStore(str(tmp_path / "state"))
+    ingest([write_feed(tmp_path / "monday.csv", [("ARR", MONDAY, "A", "B", "GTW", 3)] * 2)], store, graph)
+    ingest([write_feed(tmp_path / "tuesday.csv", [("ARR", TUESDAY, "A", "B", "GTW", 3)])], store, graph)
+    ingest([write_feed(tmp_path / "fix.csv", [("ARR", MONDAY, "A", "B", "GTW", 3)])], store, graph)
+
+    assert store.dates() == [MONDAY, TUESDAY]
+    assert store.weekday_seats("Monday").to_dict() == {("A", "B"): GTW}
+    assert store.weekday_seats("Tuesday").to_dict() == {("A", "B"): GTW}
+    assert store.weekday_seats("Wednesday").empty
+
+
+def test_rebuild_recomputes_weekday_sums_from_partials(tmp_path, graph):
+    store = PartialStore(str(tmp_path / "state"))
+    ingest([write_feed(tmp_path / "feed.csv", [("ARR", MONDAY, "A", "B", "GTW", 3)])], store, graph)
+    os.unlink(os.path.join(store.root, "weekdays", "Monday.csv"))
+    assert store.rebuild() == ["Monday"]
+    assert store.weekday_sum("Monday").to_dict() == {("A", "B"): GTW}
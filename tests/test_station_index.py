@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from station_index import StationIndex
+
+
+@pytest.fixture
+def stations():
+    return pd.DataFrame({"Station": list("abcdefg"),
+                         "Randstad": [0.0, 1.0, 1.0, 0.0, np.nan, 1.0, 0.0],
+                         "Type code": [1, 1, 2, 2, 1, 1, np.nan]})
+
+
+@pytest.mark.parametrize("randstad, type_codes", [
+    ([1.0], None), (None, [1]), ([0.0, 1.0], [1, 2]), ([1.0], [2]), ([], None), ([2.0], [1]),
+])
+def test_select_matches_a_row_filter_in_table_order(stations, randstad, type_codes):
+    mask = np.ones(len(stations), dtype=bool)
+    if randstad is not None:
+        mask &= stations["Randstad"].isin(randstad).to_numpy()
+    if type_codes is not None:
+        mask &= stations["Type code"].isin(type_codes).to_numpy()
+    pd.testing.assert_frame_equal(StationIndex(stations).select(randstad, type_codes), stations[mask])
+
+
+def test_unrestricted_select_returns_every_row(stations):
+    pd.testing.assert_frame_equal(StationIndex(stations).select(), stations)
@@ -0,0 +1,339 @@
+"""Offline vector-tile pyramid of the rail network, published as static files.
+
+Sending every polyline to the browser does not scale to the national view
+with several days or operators overlaid. ``build_tiles`` cuts the network
+into Mapbox vector tiles (MVT) for a range of zoom levels and writes them to
+an MBTiles file (SQLite). Each zoom level uses the precomputed level of
+detail that fits it. Every segment carries From, To, a label, and per day
+(and for the week total) its Seats and the green channel of its capacity
+color, so one pyramid serves every day selection. The metadata records the
+format version, the source CSVs with their modification times, and the seat
+range per day, so the app can tell a stale pyramid (``stale_reasons``) and
+draw the legend without loading the day.
+
+``export_static`` unpacks the tiles to static/tiles, which Streamlit serves
+from the app's own origin at ``STATIC_URL`` (with
+``server.enableStaticServing``), so a map (``deck_render.tile_layer``) only
+fetches the tiles in view, over the same host and scheme as the page.
+
+Build the pyramid from the CSVs in data/, fully offline:
+
+    $ python vector_tiles.py data/PlotData*.csv
+
+The MVT protobuf encoding is written directly (it is a handful of varint
+and length-delimited fields), so no tile library is needed.
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import re
+import shutil
+import sqlite3
+import struct
+
+import numpy as np
+
+from colormap import capacity_rgb
+from network import DAYS, WEEK, load_network, normalize_capacity
+from simplify import tolerance_for_zoom
+
+TILES_PATH = "RailNetwork.mbtiles"
+LAYER = "rail"
+EXTENT = 4096  # Tile coordinate grid
+BUFFER = 64  # Grid units drawn beyond the tile edge, so lines join across tiles
+MIN_ZOOM = 5
+MAX_ZOOM = 12
+TILES_VERSION = 1
+STATIC_DIR = "static/tiles"  # Under the app's static folder
+STATIC_URL = "app/static/tiles/{z}/{x}/{y}.pbf"  # Relative to the page
+
+
+# Fractional web mercator tile coordinates (x, y) at zoom 0 for lat/lon points
+def mercator(latlon):
+    lat = np.radians(np.clip(latlon[:, 0], -85.0511, 85.0511))
+    x = (latlon[:, 1] + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0
+    return np.column_stack([x, y])
+
+
+# Protobuf base-128 varints for an array of non-negative integers
+def _varints(values):
+    values = np.asarray(values, dtype=np.uint64)
+    if not len(values):
+        return b""
+    shifts = 7 * np.arange(10, dtype=np.uint64)
+    remaining = values[:, None] >> shifts
+    used = remaining > 0
+    used[:, 0] = True
+    more = np.zeros_like(used)
+    more[:, :-1] = used[:, 1:]
+    chars = (remaining & np.uint64(0x7f)) | np.where(more, np.uint64(0x80), np.uint64(0))
+    return chars[used].astype(np.uint8).tobytes()
+
+
+def _varint(value):
+    return _varints([value])
+
+
+def _zigzag(values):
+    values = np.asarray(values, dtype=np.int64)
+    return (values << 1) ^ (values >> 63)
+
+
+# Length-delimited field (wire type 2)
+def _field(number, payload):
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+# Varint field (wire type 0)
+def _int_field(number, value):
+    return _varint(number << 3) + _varint(value)
+
+
+# Encoded MVT Value message for a property value
+def _value(value):
+    if isinstance(value, str):
+        return _field(1, value.encode("utf-8"))
+    if isinstance(value, (int, np.integer)):
+        return _int_field(5, int(value)) if value >= 0 else _int_field(6, int(_zigzag([value])[0]))
+    return _varint(3 << 3 | 1) + struct.pack("<d", float(value))  # double
+
+
+# MVT command stream for line runs of integer tile coordinates. The cursor
+# carries over from one run to the next, as the spec requires.
+def _line_geometry(runs):
+    parts = []
+    cursor = np.zeros(2, dtype=np.int64)
+    for run in runs:
+        deltas = np.diff(run, axis=0, prepend=cursor[None, :])
+        params = _zigzag(deltas)
+        parts += [[1 | 1 << 3], params[0], [2 | (len(run) - 1) << 3], params[1:].ravel()]
+        cursor = run[-1]
+    return np.concatenate([np.asarray(part, dtype=np.int64).ravel() for part in parts])
+
+
+# Runs of a segment's points, in integer tile coordinates, covering the edges
+# whose bounding box meets the tile (plus buffer). Both ends of such an edge
+# are kept, so lines reach the tile edge even where simplification left
+# points far apart; the renderer clips what lies beyond.
+def _clip_runs(local):
+    low = np.minimum(local[:-1], local[1:])
+    high = np.maximum(local[:-1], local[1:])
+    hit = ((high >= -BUFFER) & (low <= EXTENT + BUFFER)).all(axis=1)
+    near = np.zeros(len(local), dtype=bool)
+    near[:-1] |= hit
+    near[1:] |= hit
+    runs = []
+    for run in np.split(np.arange(len(local)), np.flatnonzero(np.diff(near.astype(np.int8))) + 1):
+        if not near[run[0]]:
+            continue
+        points = np.round(local[run]).astype(np.int64)
+        points = points[np.concatenate([[True], (np.diff(points, axis=0) != 0).any(axis=1)])]
+        if len(points) >= 2:
+            runs.append(points)
+    return runs
+
+
+# Per segment property list: From, To and a label, plus Seats_<day> and
+# g_<day> (green channel of the capacity color) for every day it runs on
+def segment_properties(network, days=None):
+    days = list(days) if days is not None else network.days + [WEEK]
+    properties = [[("From", start), ("To", end), ("label", f"{start} - {end}")]
+                  for start, end in zip(network.segments["From"], network.segments["To"])]
+    for day in days:
+        seats = network.day_seats(day)
+        green = capacity_rgb(normalize_capacity(seats))[:, 1]
+        for i in np.flatnonzero(seats.notna().to_numpy()):
+            properties[i] += [(f"Seats_{day}", float(seats.iloc[i])), (f"g_{day}", int(green[i]))]
+    return properties
+
+
+# One encoded (uncompressed) tile from {segment id: line runs}
+def encode_tile(features, properties, layer=LAYER):
+    keys, values = {}, {}
+    encoded = []
+    for segment, runs in features.items():
+        tags = []
+        for key, value in properties[segment]:
+            # Keyed by type too: 255 and 255.0 are different MVT values
+            tags += [keys.setdefault(key, len(keys)), values.setdefault((type(value), value), len(values))]
+        encoded.append(_field(2, _int_field(1, segment + 1)  # Feature ids start at 1
+                              + _field(2, _varints(tags))
+                              + _int_field(3, 2)  # LINESTRING
+                              + _field(4, _varints(_line_geometry(runs).astype(np.uint64)))))
+    body = (_int_field(15, 2) + _field(1, layer.encode("utf-8")) + b"".join(encoded)
+            + b"".join(_field(3, key.encode("utf-8")) for key in keys)
+            + b"".join(_field(4, _value(value)) for _, value in values)
+            + _int_field(5, EXTENT))
+    return _field(3, body)
+
+
+# {(x, y): {segment id: runs}} for one zoom level
+def cut_zoom(network, zoom):
+    tolerance = tolerance_for_zoom(zoom)
+    keep = network.level(tolerance) if tolerance is not None else np.ones(len(network.latlon), dtype=bool)
+    world = mercator(network.latlon) * 2 ** zoom
+    tiles = {}
+    for segment, (start, end) in enumerate(zip(network.offsets[:-1], network.offsets[1:])):
+        points = world[start:end][keep[start:end]]
+        if len(points) < 2:
+            continue
+        margin = BUFFER / EXTENT
+        low = np.floor(points.min(axis=0) - margin).astype(int)
+        high = np.floor(points.max(axis=0) + margin).astype(int)
+        for x in range(max(low[0], 0), min(high[0], 2 ** zoom - 1) + 1):
+            for y in range(max(low[1], 0), min(high[1], 2 ** zoom - 1) + 1):
+                runs = _clip_runs((points - (x, y)) * EXTENT)
+                if runs:
+                    tiles.setdefault((x, y), {})[segment] = runs
+    return tiles
+
+
+# Write the tile pyramid of network to an MBTiles file, atomically
+def build_tiles(network, out_path=TILES_PATH, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, sources=()):
+    properties = segment_properties(network)
+    tmp_path = out_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    db = sqlite3.connect(tmp_path)
+    db.executescript("""
+        CREATE TABLE metadata (name TEXT, value TEXT);
+        CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+        CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row);
+    """)
+    count = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        rows = [(zoom, x, 2 ** zoom - 1 - y, gzip.compress(encode_tile(features, properties)))  # TMS rows
+                for (x, y), features in cut_zoom(network, zoom).items()]
+        db.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)", rows)
+        count += len(rows)
+
+    south, west = network.latlon.min(axis=0)
+    north, east = network.latlon.max(axis=0)
+    fields = {"From": "String", "To": "String", "label": "String"}
+    seats = {}
+    for day in network.days + [WEEK]:
+        fields.update({f"Seats_{day}": "Number", f"g_{day}": "Number"})
+        day_seats = network.day_seats(day)
+        seats[day] = [float(day_seats.min()), float(day_seats.max())]
+    metadata = {
+        "name": "Rail network", "format": "pbf", "type": "overlay",
+        "minzoom": min_zoom, "maxzoom": max_zoom,
+        "bounds": f"{west},{south},{east},{north}",
+        "center": f"{(west + east) / 2},{(south + north) / 2},{min_zoom}",
+        "json": json.dumps({"vector_layers": [
+            {"id": LAYER, "fields": fields, "minzoom": min_zoom, "maxzoom": max_zoom}]}),
+        "version": TILES_VERSION,
+        "sources": json.dumps({path: os.path.getmtime(path) for path in sources}),
+        "seats": json.dumps(seats),  # [min, max] per day, for the legend
+    }
+    db.executemany("INSERT INTO metadata VALUES (?, ?)", [(k, str(v)) for k, v in metadata.items()])
+    db.commit()
+    db.close()
+    os.replace(tmp_path, out_path)
+    return count
+
+
+# {day: path} for PlotData<Day>.csv files; the week file is left out, since
+# the week total is derived from the days
+def day_paths(csv_paths):
+    paths = {}
+    for path in csv_paths:
+        match = re.search(r"PlotData(\w+)\.csv$", os.path.basename(path))
+        if match and match.group(1) in DAYS:
+            paths[match.group(1)] = path
+    return paths
+
+
+# Metadata of an MBTiles file as {name: value}, with the JSON values decoded
+def read_metadata(path=TILES_PATH):
+    db = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        metadata = dict(db.execute("SELECT name, value FROM metadata"))
+    finally:
+        db.close()
+    for name in ("json", "sources", "seats"):
+        if name in metadata:
+            metadata[name] = json.loads(metadata[name])
+    return metadata
+
+
+# Why the pyramid at path cannot be served for the day files ({day: path}):
+# missing, built by another TILES_VERSION, or built from other or since
+# changed files. Empty when it is up to date.
+def stale_reasons(path=TILES_PATH, sources=None):
+    if not os.path.exists(path):
+        return [f"there are no vector tiles at {path}"]
+    metadata = read_metadata(path)
+    if metadata.get("version") != str(TILES_VERSION):
+        return [f"{path} has tile format version {metadata.get('version')}, expected {TILES_VERSION}"]
+    built = metadata.get("sources", {})
+    built_days = day_paths(built)
+    reasons = []
+    for day, source in (sources or {}).items():
+        previous = built_days.get(day)
+        if previous is None or os.path.realpath(previous) != os.path.realpath(source):
+            reasons.append(f"{day} was not built from {source}")
+        elif not os.path.exists(source) or os.path.getmtime(source) != built[previous]:
+            reasons.append(f"{source} changed after the tiles were built")
+    return reasons
+
+
+# Unpack the tiles of an MBTiles file to out_dir/{z}/{x}/{y}.pbf (XYZ rows),
+# with its metadata as metadata.json. The tiles are stored uncompressed, as a
+# static file server does not mark them gzip encoded. A directory that
+# already holds this build is kept; otherwise it is replaced whole.
+# Returns the metadata.
+def export_static(path=TILES_PATH, out_dir=STATIC_DIR):
+    metadata = read_metadata(path)
+    metadata["build"] = os.path.getmtime(path)
+    metadata_path = os.path.join(out_dir, "metadata.json")
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            if json.load(f).get("build") == metadata["build"]:
+                return metadata
+
+    tmp_dir, old_dir = out_dir + ".tmp", out_dir + ".old"
+    for stale in (tmp_dir, old_dir):
+        shutil.rmtree(stale, ignore_errors=True)
+    db = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        for z, x, row, data in db.execute("SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles"):
+            tile_path = os.path.join(tmp_dir, str(z), str(x), f"{2 ** z - 1 - row}.pbf")
+            os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+            with open(tile_path, "wb") as f:
+                f.write(gzip.decompress(data) if data[:2] == b"\x1f\x8b" else data)
+    finally:
+        db.close()
+    with open(os.path.join(tmp_dir, "metadata.json"), "w") as f:
+        json.dump(metadata, f)
+
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a vector-tile pyramid (MBTiles) of the rail network.")
+    parser.add_argument("csv", nargs="*", help="PlotData<Day>.csv files (default: data/PlotData*.csv)")
+    parser.add_argument("--out", default=TILES_PATH)
+    parser.add_argument("--min-zoom", type=int, default=MIN_ZOOM)
+    parser.add_argument("--max-zoom", type=int, default=MAX_ZOOM)
+    parser.add_argument("--static", action="store_true", help=f"Also unpack the tiles to {STATIC_DIR}")
+    args = parser.parse_args()
+
+    paths = day_paths(args.csv or sorted(glob.glob("data/PlotData*.csv")))
+    network = load_network(paths)
+    count = build_tiles(network, args.out, args.min_zoom, args.max_zoom, sources=paths.values())
+    print(f"{len(network)} segments, zoom {args.min_zoom}-{args.max_zoom}: {count} tiles -> {args.out}")
+    if args.static:
+        export_static(args.out)
+        print(f"Unpacked to {STATIC_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Persistent on-disk cache for processed line data.
+
+``st.cache_data`` only lives in process memory, so every deploy or worker
+restart used to re-parse and re-project all day files. ``cached_frame``
+keeps the processed frame of a PlotData file on disk as an uncompressed
+``.npz``: scalar columns as plain arrays, and per-row coordinate columns
+(``coords``, ``latlon_coords``) as one flat buffer plus offsets.
+
+An entry is keyed by a content hash of the source CSV, the source code of
+the module that defines the processing function and of the helper modules
+that decide its output (``HELPER_MODULES``: reading, parsing, projection,
+simplification, colors, the network model), and ``CACHE_VERSION``, so
+editing any of them invalidates it automatically. Hashing the whole module
+also covers what a thin wrapper such as ``process_line_file`` calls. Bump
+``CACHE_VERSION`` when the output changes in a way the sources do not show,
+such as a dependency upgrade.
+The cache directory defaults to ``.line_cache`` and can be moved with the
+``LINE_CACHE_DIR`` environment variable.
+"""
+import hashlib
+import importlib
+import inspect
+import os
+import tempfile
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+CACHE_VERSION = 2
+CACHE_DIR = os.environ.get("LINE_CACHE_DIR", ".line_cache")
+RAGGED_SUFFIX = ("__values", "__offsets")
+HELPER_MODULES = ("colormap", "geometry", "line_store", "network", "projection", "simplify")
+
+_content_hashes = {}  # (path, mtime, size) -> sha256 of the file
+
+
+# sha256 of a file's contents, remembered per (path, mtime, size)
+def content_hash(path):
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _content_hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _content_hashes[key] = digest.hexdigest()
+    return _content_hashes[key]
+
+
+# Source code of the helper modules, read once per process
+@lru_cache(maxsize=None)
+def helper_source():
+    return "".join(inspect.getsource(importlib.import_module(name)) for name in HELPER_MODULES)
+
+
+# Source code of the module that defines process, or of process alone when
+# its module has no source file
+def process_source(process):
+    try:
+        return inspect.getsource(inspect.getmodule(process))
+    except (OSError, TypeError):
+        return inspect.getsource(process)
+
+
+# Cache key for the output of process applied to the file at path
+def cache_key(path, process):
+    digest = hashlib.sha256()
+    digest.update(str(CACHE_VERSION).encode())
+    digest.update(process_source(process).encode())
+    digest.update(helper_source().encode())
+    digest.update(content_hash(path).encode())
+    return digest.hexdigest()
+
+
+def _is_ragged(column):
+    first = column.iloc[0] if len(column) else None
+    return isinstance(first, (np.ndarray, list))
+
+
+# Write a processed frame as flat arrays; ragged coordinate columns become
+# a values buffer plus offsets, None rows are kept as empty rows
+def save_frame(path, df):
+    arrays = {}
+    for name, column in df.items():
+        if column.dtype == object and _is_ragged(column):
+            segments = [np.empty((0, 2)) if c is None else np.asarray(c, dtype=np.float64).reshape(-1, 2)
+                        for c in column]
+            lengths = np.fromiter((len(s) for s in segments), dtype=np.int64, count=len(segments))
+            arrays[name + RAGGED_SUFFIX[0]] = np.concatenate(segments) if segments else np.empty((0, 2))
+            arrays[name + RAGGED_SUFFIX[1]] = np.concatenate([[0], np.cumsum(lengths)])
+        elif column.dtype == object or pd.api.types.is_string_dtype(column):
+            arrays[name] = np.array(column.astype(str).tolist(), dtype=str)
+        else:
+            arrays[name] = column.to_numpy()
+
+    # Write to a temporary file and swap in, so readers never see half an entry
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+# Inverse of save_frame; ragged columns come back as views into one buffer
+def load_frame(path):
+    columns = {}
+    with np.load(path) as arrays:
+        for name in arrays.files:
+            if name.endswith(RAGGED_SUFFIX[1]):
+                continue
+            if name.endswith(RAGGED_SUFFIX[0]):
+                base = name[:-len(RAGGED_SUFFIX[0])]
+                values = arrays[name]
+                offsets = arrays[base + RAGGED_SUFFIX[1]]
+                columns[base] = np.split(values, offsets[1:-1]) if len(offsets) > 1 else []
+            else:
+                columns[name] = arrays[name]
+    return pd.DataFrame(columns)
+
+
+# Output of process(path), served from the on-disk cache when it is warm
+def cached_frame(path, process, cache_dir=None):
+    entry = os.path.join(cache_dir or CACHE_DIR, cache_key(path, process) + ".npz")
+    if os.path.exists(entry):
+        try:
+            return load_frame(entry)
+        except (OSError, ValueError, KeyError):
+            pass  # Unreadable entry: rebuild it below
+    df = process(path)
+    save_frame(entry, df)
+    return df